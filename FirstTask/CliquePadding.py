@@ -0,0 +1,202 @@
+import itertools
+import numpy as np
+from PauliTable import PauliTable, PackBits, Popcount, UnpackBits, IDENTITY_CHARACTERS
+from GF2Algebra import SymplecticVectors, GF2Basis
+
+'''
+This file contains the padding of a family with low weight Pauli strings, for any number of qubits (PadClique in MethodsUpdate.py).
+
+A family of commuting strings spans an isotropic subspace S of the symplectic vectors (x | z) (see GF2Algebra.py). A string can be added
+if it commutes with the family and is independent of it, i.e. if its vector is in the symplectic complement of S but not in S.
+Since the largest isotropic subspaces have dimension nQ, a family of rank r can get at most nQ - r new strings.
+
+The candidates are enumerated lazily in weight order (weight 1, 2, ..., maxWeight, see LowWeightStrings), in chunks of positions and
+letters. A string of weight w is only nonidentity on w qubits, so whether it commutes with the k generators of S is the XOR (OR for QWC)
+of w precomputed k bit masks, one per (qubit, letter): the generators that anticommute with that letter on that qubit.
+This is done for a whole chunk at once, the candidates that pass are checked one by one for independence (GF2Basis).
+So a family on 50+ qubits only looks at ~3^maxWeight C(nQ, maxWeight) of the 4^nQ strings, each in O(maxWeight k / 8) byte operations.
+
+With QWC, the single qubit strings always suffice. With GC, the remaining strings are taken from the symplectic complement directly
+(Gaussian elimination) if there are not enough low weight strings up to maxWeight.
+'''
+
+# single qubit Paulis as (x, z), in the order of the old trivialStrings
+_LETTERS = np.array([(1, 0), (1, 1), (0, 1)], dtype=bool)
+
+
+def _LowWeightChunks(nQ: int, maxWeight: int, chunkSize: int):
+    '''
+    generator of (positions, letters), int arrays (chunk, weight): qubits and indices into _LETTERS, in weight order
+    '''
+    for weight in range(1, maxWeight + 1):
+        letters = np.array(list(itertools.product(range(len(_LETTERS)), repeat=weight)), dtype=np.int64).reshape(-1, weight)
+        nLetters = len(letters)
+
+        positions = itertools.combinations(range(nQ), weight)
+        nPositions = max(1, chunkSize // nLetters)
+
+        while True:
+            batch = np.array(list(itertools.islice(positions, nPositions)), dtype=np.int64).reshape(-1, weight)
+            if len(batch) == 0:
+                break
+
+            # every set of positions with every combination of letters
+            yield np.repeat(batch, nLetters, axis=0), np.tile(letters, (len(batch), 1))
+
+
+def _ToMasks(positions, letters, nQ: int):
+    rows = np.repeat(np.arange(len(positions)), positions.shape[1])
+    x = np.zeros((len(positions), nQ), dtype=bool)
+    z = np.zeros((len(positions), nQ), dtype=bool)
+    x[rows, positions.ravel()] = _LETTERS[letters.ravel(), 0]
+    z[rows, positions.ravel()] = _LETTERS[letters.ravel(), 1]
+
+    return PackBits(x), PackBits(z)
+
+
+def LowWeightStrings(nQ: int, maxWeight: int = None, chunkSize: int = 2**14):
+    '''
+    generator of all Pauli strings with 1 <= weight <= maxWeight, in weight order
+
+    Yields:
+        xBits, zBits:   uint64 arrays (chunk, nWords), about chunkSize strings of the same weight
+    '''
+    maxWeight = nQ if maxWeight is None else min(maxWeight, nQ)
+
+    for positions, letters in _LowWeightChunks(nQ, maxWeight, chunkSize):
+        yield _ToMasks(positions, letters, nQ)
+
+
+def _AnticommutationTable(xBits, zBits, nQ: int):
+    '''
+    uint8 array (nQ, 3, bytes): bit g of entry (q, l) is set if generator g anticommutes with letter l on qubit q
+    '''
+    x, z = UnpackBits(xBits, nQ).T, UnpackBits(zBits, nQ).T
+    table = (_LETTERS[None, :, 0, None] & z[:, None, :]) ^ (_LETTERS[None, :, 1, None] & x[:, None, :])
+
+    return np.packbits(table, axis=2)
+
+
+def _Commutes(vector1: int, vector2: int, nQ: int, QWC: bool) -> bool:
+    mask = (1 << nQ) - 1
+    anticommuting = ((vector1 & mask) & (vector2 >> nQ)) ^ ((vector1 >> nQ) & (vector2 & mask))
+
+    if QWC:
+        return anticommuting == 0
+    return bin(anticommuting).count('1') % 2 == 0
+
+
+def _SymplecticComplement(vectors: list, nQ: int) -> list:
+    '''
+    basis of all vectors that commute with the given ones, by Gaussian elimination of the (swapped) constraint rows
+    '''
+    # v commutes with b iff <(b_z | b_x), v> = 0
+    constraints = np.zeros((len(vectors), 2*nQ), dtype=bool)
+    for row, vector in enumerate(vectors):
+        swapped = (vector >> nQ) | ((vector & ((1 << nQ) - 1)) << nQ)
+        constraints[row] = [(swapped >> bit) & 1 for bit in range(2*nQ)]
+
+    pivots, row = [], 0
+    for column in range(2*nQ):
+        if row == len(vectors):
+            break
+        candidates = np.flatnonzero(constraints[row:, column])
+        if len(candidates) == 0:
+            continue
+
+        pivot = row + candidates[0]
+        constraints[[row, pivot]] = constraints[[pivot, row]]
+        others = constraints[:, column].copy()
+        others[row] = False
+        constraints[others] ^= constraints[row]
+
+        pivots.append(column)
+        row += 1
+
+    # one null space vector per free column
+    complement = []
+    for free in sorted(set(range(2*nQ)) - set(pivots)):
+        vector = 1 << free
+        for pivotRow, pivot in enumerate(pivots):
+            if constraints[pivotRow, free]:
+                vector |= 1 << pivot
+        complement.append(vector)
+
+    return complement
+
+
+def _Weight(vector: int, nQ: int) -> int:
+    return bin((vector & ((1 << nQ) - 1)) | (vector >> nQ)).count('1')
+
+
+def _ToLabel(vector: int, nQ: int, identity: str) -> str:
+    x, z = vector & ((1 << nQ) - 1), vector >> nQ
+    return ''.join('1XZY'[((x >> qubit) & 1) + 2*((z >> qubit) & 1)] for qubit in range(nQ)).replace('1', identity)
+
+
+def PaddingStrings(clique: list, nStrings: int = None, QWC: bool = False, maxWeight: int = 3, chunkSize: int = 2**14) -> list:
+    '''
+    Accepts:
+        clique:         list of commuting Pauli strings
+        nStrings:       number of strings to find. Default: nQ - len(clique). At most nQ - rank of the clique are possible
+        QWC:            if True, the strings qubit wise commute with the clique (and each other), otherwise they commute
+        maxWeight:      highest weight that is enumerated, before the complement is used (GC only)
+
+    Returns:
+        list of new strings (same identity character as the clique), that commute with the clique and each other and are
+        independent of the clique and each other, lowest weight first
+    '''
+    table = PauliTable(clique)
+    nQ = table.nQ
+    identity = 'I' if any('I' in pauliString for pauliString in clique) else IDENTITY_CHARACTERS[0]
+
+    basis = GF2Basis()
+    generators = [index for index, vector in enumerate(SymplecticVectors(table)) if basis.Add(vector)]
+    generatorX, generatorZ = table.xBits[generators], table.zBits[generators]
+
+    counts = Popcount((generatorX[:, None] & generatorZ[None]) ^ (generatorZ[:, None] & generatorX[None])).sum(axis=2)
+    if np.any(counts != 0 if QWC else counts % 2 != 0):
+        raise ValueError('only a family of ' + ('qubit wise ' if QWC else '') + 'commuting strings can be padded')
+
+    nStrings = nQ - len(clique) if nStrings is None else nStrings
+    nStrings = max(0, min(nStrings, nQ - len(basis)))
+
+    added = []
+    reduction = np.bitwise_or if QWC else np.bitwise_xor
+    anticommuting = _AnticommutationTable(generatorX, generatorZ, nQ)
+
+    for positions, letters in _LowWeightChunks(nQ, nQ if QWC else maxWeight, chunkSize):
+        if len(added) == nStrings:
+            break
+
+        # commutation with the generators of the clique and the strings added so far, for the whole chunk
+        candidates = np.flatnonzero(~reduction.reduce(anticommuting[positions, letters], axis=1).any(axis=1))
+        if len(candidates) == 0:
+            continue
+
+        # the strings added from this chunk are not in the table yet
+        addedInChunk = []
+        xBits, zBits = _ToMasks(positions[candidates], letters[candidates], nQ)
+        xInts, zInts = PauliTable.FromMasks(xBits, zBits, nQ).ToIntegers()
+
+        for candidate, (x, z) in enumerate(zip(xInts, zInts)):
+            vector = x | (z << nQ)
+            if all(_Commutes(vector, added[-1 - other], nQ, QWC) for other in range(len(addedInChunk))) and basis.Add(vector):
+                added.append(vector)
+                addedInChunk.append(candidate)
+                if len(added) == nStrings:
+                    break
+
+        if addedInChunk:
+            generatorX = np.concatenate((generatorX, xBits[addedInChunk]))
+            generatorZ = np.concatenate((generatorZ, zBits[addedInChunk]))
+            anticommuting = _AnticommutationTable(generatorX, generatorZ, nQ)
+
+    # GC only: the shortest remaining strings are longer than maxWeight, take them from the complement
+    while len(added) < nStrings:
+        complement = _SymplecticComplement(basis.Vectors(), nQ)
+        vector = min((vector for vector in complement if not basis.Contains(vector)), key=lambda vector: _Weight(vector, nQ))
+        basis.Add(vector)
+        added.append(vector)
+
+    return [_ToLabel(vector, nQ, identity) for vector in added]
@@ -0,0 +1,351 @@
+import os
+import tempfile
+import numpy as np
+import networkx as nx
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from PauliTable import PauliTable, Popcount
+
+'''
+This file contains a vectorized version of create_Graph_QWC and create_Graph_GC.
+
+Instead of adding the edges one by one to a networkx graph, the whole n x n adjacency matrix is computed as a boolean NumPy array.
+The matrix is computed in blocks of rows, so the temporary arrays stay small even for 10^5 strings.
+A networkx graph is only built if it is actually needed, e.g. for drawing.
+
+For very large sets, BuildAdjacencyParallel splits the rows into tiles that are computed in a process pool. The packed masks are put in
+shared memory once, and every worker writes its bit packed rows directly into a memory mapped .npy file, so no process ever holds the
+whole matrix.
+
+The commutation modes are named as everywhere else in FirstTask:
+    'QWC':          qubit wise commutation
+    'GC':           general commutation
+    'without_QWC':  general commutation, but not qubit wise commutation (create_Graph_GC(..., without_QWC = True))
+'''
+
+COMMUTATION_MODES = ('QWC', 'GC', 'without_QWC')
+
+# number of uint64 entries in one temporary (rows x columns) array, ~16 MB
+_BLOCK_ENTRIES = 2**21
+
+
+def _AsPauliTable(paulistrings) -> PauliTable:
+    return paulistrings if isinstance(paulistrings, PauliTable) else PauliTable(paulistrings)
+
+
+def CommutationBlock(table: PauliTable, rows, columns, mode: str = 'GC'):
+    '''
+    Accepts:
+        table:      PauliTable
+        rows:       slice or index array of the strings in the rows of the block
+        columns:    slice or index array of the strings in the columns of the block
+        mode:       'QWC', 'GC' or 'without_QWC'
+
+    Returns:
+        boolean array of shape (len(rows), len(columns)), True where the strings commute under the given mode.
+        The diagonal (a string with itself) is not treated separately here.
+    '''
+    if mode not in COMMUTATION_MODES:
+        raise ValueError('mode has to be one of ' + str(COMMUTATION_MODES) + ', not ' + str(mode))
+
+    xRows, zRows = table.xBits[rows], table.zBits[rows]
+    xColumns, zColumns = table.xBits[columns], table.zBits[columns]
+
+    # the anticommuting positions of all words are combined: xor for the parity (GC), or for 'is there any' (QWC)
+    parity = np.zeros((xRows.shape[0], xColumns.shape[0]), dtype=np.uint64)
+    anyAnticommuting = np.zeros((xRows.shape[0], xColumns.shape[0]), dtype=np.uint64)
+
+    for word in range(table.xBits.shape[1]):
+        anticommuting = (xRows[:, None, word] & zColumns[None, :, word]) ^ (zRows[:, None, word] & xColumns[None, :, word])
+        parity ^= anticommuting
+        anyAnticommuting |= anticommuting
+
+    if mode == 'QWC':
+        return anyAnticommuting == 0
+
+    commuting = (Popcount(parity) & 1) == 0
+
+    if mode == 'without_QWC':
+        commuting &= anyAnticommuting != 0
+
+    return commuting
+
+
+def BuildAdjacency(paulistrings, mode: str = 'GC', blockSize: int = None, packed: bool = False, returnGraph: bool = False):
+    '''
+    Computes the adjacency matrix of the commutation graph of all Pauli strings.
+
+    Accepts:
+        paulistrings:   list of Pauli strings or PauliTable
+        mode:           'QWC', 'GC' or 'without_QWC'
+        blockSize:      number of rows that are computed at once. Default: chosen such that the temporaries are ~16 MB
+        packed:         if True, every row is bit packed with np.packbits(..., bitorder='little'), 8 times less memory
+        returnGraph:    if True, also build the networkx graph (and the edge colors of create_Graph_GC). Only sensible for small sets
+
+    Returns:
+        adjacency:      boolean array (n, n), or uint8 array (n, ceil(n/8)) if packed. No self loops.
+        (if returnGraph) graph, edgeColors
+    '''
+    table = _AsPauliTable(paulistrings)
+    nTerms = len(table)
+
+    if blockSize is None:
+        blockSize = max(1, _BLOCK_ENTRIES // max(nTerms, 1))
+
+    if packed:
+        adjacency = np.zeros((nTerms, -(-nTerms // 8)), dtype=np.uint8)
+    else:
+        adjacency = np.zeros((nTerms, nTerms), dtype=bool)
+
+    for start in range(0, nTerms, blockSize):
+        stop = min(start + blockSize, nTerms)
+
+        if packed:
+            block = CommutationBlock(table, slice(start, stop), slice(None), mode)
+            block[np.arange(stop - start), np.arange(start, stop)] = False
+            adjacency[start:stop] = np.packbits(block, axis=1, bitorder='little')
+            continue
+
+        # the matrix is symmetric, so only the columns from start on are computed and mirrored
+        block = CommutationBlock(table, slice(start, stop), slice(start, None), mode)
+        block[np.arange(stop - start), np.arange(stop - start)] = False
+        adjacency[start:stop, start:] = block
+        adjacency[start:, start:stop] = block.T
+
+    if not returnGraph:
+        return adjacency
+
+    if packed:
+        adjacency = UnpackAdjacency(adjacency, nTerms)
+
+    graph, edgeColors = AdjacencyToGraph(adjacency, table, colorEdges = mode != 'QWC')
+
+    return adjacency, graph, edgeColors
+
+
+def UnpackAdjacency(packedAdjacency, nTerms: int = None):
+    '''
+    inverse of the packed option of BuildAdjacency
+    '''
+    if nTerms is None:
+        nTerms = packedAdjacency.shape[0]
+
+    return np.unpackbits(packedAdjacency, axis=1, count=nTerms, bitorder='little').astype(bool)
+
+
+def AdjacencyToGraph(adjacency, paulistrings, colorEdges: bool = False):
+    '''
+    Builds the same networkx graph as create_Graph_QWC / create_Graph_GC from an adjacency matrix.
+
+    Accepts:
+        adjacency:      boolean (n, n) array, or bit packed rows (e.g. the memory map of BuildAdjacencyParallel)
+        paulistrings:   list of Pauli strings or PauliTable, used as node labels
+        colorEdges:     if True, edges are colored blue for QWC and red for GC only, as in create_Graph_GC
+
+    Returns:
+        graph, edgeColors (empty list if colorEdges is False)
+    '''
+    table = _AsPauliTable(paulistrings)
+    labels = list(table)
+    nTerms = len(labels)
+    labelIds = np.unique(np.array(labels, dtype=object), return_inverse=True)[1] if nTerms > 0 else np.zeros(0, dtype=np.int64)
+
+    graph = nx.Graph()
+    graph.add_nodes_from(labels)
+    colorOfEdge = {}
+
+    # the rows are read in blocks, so a memory mapped adjacency is never loaded completely
+    blockSize = max(1, _BLOCK_ENTRIES // max(nTerms, 1))
+
+    for start in range(0, nTerms, blockSize):
+        stop = min(start + blockSize, nTerms)
+        block = adjacency[start:stop]
+        if block.dtype != bool:
+            block = UnpackAdjacency(block, nTerms)
+
+        first, second = np.nonzero(np.triu(block, start + 1))
+        first += start
+
+        # Paulistring always commutes with itself, repeated strings are not connected
+        different = labelIds[first] != labelIds[second]
+        first, second = first[different], second[different]
+
+        graph.add_edges_from(zip([labels[i] for i in first], [labels[j] for j in second]))
+
+        if colorEdges:
+            anticommuting = (table.xBits[first] & table.zBits[second]) ^ (table.zBits[first] & table.xBits[second])
+            isQWC = Popcount(anticommuting).sum(axis=1) == 0
+            for i, j, qwc in zip(first, second, isQWC):
+                colorOfEdge[frozenset((labels[i], labels[j]))] = 'blue' if qwc else 'red'
+
+    # networkx draws the edges in the order of graph.edges, so the colors have to follow this order
+    edgeColors = [colorOfEdge[frozenset(edge)] for edge in graph.edges] if colorEdges else []
+
+    return graph, edgeColors
+
+
+def GraphToAdjacency(graph):
+    '''
+    inverse of AdjacencyToGraph, turns a graph from create_Graph_QWC / create_Graph_GC into (adjacency, labels)
+    '''
+    labels = list(graph.nodes)
+    adjacency = nx.to_numpy_array(graph, nodelist=labels, dtype=bool, weight=None)
+    np.fill_diagonal(adjacency, False)
+
+    return adjacency, labels
+
+
+class PackedAdjacency:
+    '''
+    Bit packed adjacency (BuildAdjacency(..., packed = True) or the memory map of BuildAdjacencyParallel) that is unpacked one row at a time.
+    Offers the part of a boolean matrix the greedy colorings use: shape, adjacency[i] and adjacency.sum(axis = 1)
+    '''
+
+    def __init__(self, packedAdjacency, nTerms: int = None):
+        self.packed = packedAdjacency
+        if nTerms is None:
+            nTerms = packedAdjacency.shape[0]
+        self.shape = (nTerms, nTerms)
+
+    def __getitem__(self, index):
+        return np.unpackbits(self.packed[index], count=self.shape[1], bitorder='little').astype(bool)
+
+    def sum(self, axis: int):
+        if axis != 1:
+            raise ValueError('only the row sums of a packed adjacency are supported')
+
+        # the padding bits of the rows are zero, so the row sums are the set bits. Read in blocks, a memory map is never loaded completely
+        nTerms = self.shape[0]
+        blockSize = max(1, _BLOCK_ENTRIES // max(self.packed.shape[1], 1))
+
+        return np.concatenate([Popcount(self.packed[start:start + blockSize]).sum(axis=1, dtype=np.int64)
+                               for start in range(0, nTerms, blockSize)] or [np.zeros(0, dtype=np.int64)])
+
+
+def IsPackedAdjacency(adjacency) -> bool:
+    '''
+    True for bit packed rows of shape (n, ceil(n/8)) as returned by BuildAdjacency(..., packed = True) and BuildAdjacencyParallel
+    '''
+    return (isinstance(adjacency, np.ndarray) and adjacency.dtype == np.uint8 and adjacency.ndim == 2
+            and adjacency.shape[0] > 1 and adjacency.shape[1] == -(-adjacency.shape[0] // 8))
+
+
+def AsAdjacency(graph, labels = None, keepPacked: bool = False):
+    '''
+    accepts either a networkx graph (from create_Graph_QWC / create_Graph_GC), a boolean adjacency matrix or bit packed rows,
+    returns (adjacency, labels). Bit packed rows are wrapped in a PackedAdjacency if keepPacked is True, otherwise unpacked
+    '''
+    if isinstance(graph, nx.Graph):
+        return GraphToAdjacency(graph)
+
+    if IsPackedAdjacency(graph):
+        adjacency = PackedAdjacency(graph) if keepPacked else UnpackAdjacency(graph)
+    else:
+        adjacency = np.asarray(graph, dtype=bool)
+    if labels is None:
+        labels = list(range(adjacency.shape[0]))
+
+    return adjacency, list(labels)
+
+
+# state of a worker process of BuildAdjacencyParallel, set by _InitWorker
+_worker = {}
+
+
+def _InitWorker(xName: str, zName: str, shape: tuple, nQ: int, path: str, mode: str):
+    xMemory, zMemory = SharedMemory(name=xName), SharedMemory(name=zName)
+
+    _worker['memory'] = (xMemory, zMemory)
+    _worker['table'] = PauliTable.FromMasks(np.ndarray(shape, dtype=np.uint64, buffer=xMemory.buf),
+                                            np.ndarray(shape, dtype=np.uint64, buffer=zMemory.buf), nQ)
+    _worker['output'] = np.lib.format.open_memmap(path, mode='r+')
+    _worker['mode'] = mode
+
+
+def _ComputeTile(bounds: tuple) -> int:
+    start, stop = bounds
+    output = _worker['output']
+
+    block = CommutationBlock(_worker['table'], slice(start, stop), slice(None), _worker['mode'])
+    block[np.arange(stop - start), np.arange(start, stop)] = False
+
+    output[start:stop] = np.packbits(block, axis=1, bitorder='little')
+    output.flush()
+
+    return stop - start
+
+
+def BuildAdjacencyParallel(paulistrings, mode: str = 'GC', path: str = None, nWorkers: int = None, tileRows: int = None):
+    '''
+    Same as BuildAdjacency(..., packed = True), but the row tiles are computed in a process pool and written to a memory mapped file.
+
+    Accepts:
+        paulistrings:   list of Pauli strings or PauliTable
+        mode:           'QWC', 'GC' or 'without_QWC'
+        path:           .npy file for the bit packed adjacency. Default: a new file in the temp directory
+        nWorkers:       number of processes, default os.cpu_count()
+        tileRows:       rows per tile, default: chosen such that the temporaries of a worker are ~16 MB
+
+    Returns:
+        read only np.memmap of shape (n, ceil(n/8)), rows packed as in BuildAdjacency. Can be reopened with np.load(path, mmap_mode='r')
+    '''
+    if mode not in COMMUTATION_MODES:
+        raise ValueError('mode has to be one of ' + str(COMMUTATION_MODES) + ', not ' + str(mode))
+
+    table = _AsPauliTable(paulistrings)
+    nTerms = len(table)
+
+    if path is None:
+        fileDescriptor, path = tempfile.mkstemp(suffix='.npy', prefix='adjacency_')
+        os.close(fileDescriptor)
+
+    if nWorkers is None:
+        nWorkers = os.cpu_count() or 1
+    if tileRows is None:
+        tileRows = max(1, _BLOCK_ENTRIES // max(nTerms, 1))
+
+    output = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(nTerms, -(-nTerms // 8)))
+    output.flush()
+    del output
+
+    # the masks are copied into shared memory once, the workers only map them
+    memories = []
+    try:
+        for bits in (table.xBits, table.zBits):
+            memory = SharedMemory(create=True, size=max(bits.nbytes, 1))
+            np.ndarray(bits.shape, dtype=np.uint64, buffer=memory.buf)[:] = bits
+            memories.append(memory)
+
+        tiles = [(start, min(start + tileRows, nTerms)) for start in range(0, nTerms, tileRows)]
+        initArguments = (memories[0].name, memories[1].name, table.xBits.shape, table.nQ, path, mode)
+
+        with Pool(nWorkers, initializer=_InitWorker, initargs=initArguments) as pool:
+            for _ in pool.imap_unordered(_ComputeTile, tiles, chunksize=max(1, len(tiles) // (8*nWorkers))):
+                pass
+    finally:
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    return np.load(path, mmap_mode='r')
+
+
+def BuildGraphParallel(paulistrings, mode: str = 'GC', nWorkers: int = None, adjacencyFile: str = None):
+    '''
+    networkx graph (and edge colors for GC) from BuildAdjacencyParallel, as used by create_Graph_QWC / create_Graph_GC with nWorkers
+    and asGraph = True. The adjacency file is kept if a path is given, otherwise it is a temporary file that is removed after the graph is built.
+
+    The graph is held in memory completely: networkx needs a few hundred bytes per edge, i.e. far more than the n^2 / 8 bytes of the packed
+    matrix (for 2 * 10^5 strings and half of the pairs commuting, ~10^10 edges). For large sets, use the packed matrix of
+    BuildAdjacencyParallel directly, e.g. with PartitionFamilies.
+    '''
+    packedAdjacency = BuildAdjacencyParallel(paulistrings, mode, adjacencyFile, nWorkers)
+    path = packedAdjacency.filename
+
+    graph, edgeColors = AdjacencyToGraph(packedAdjacency, paulistrings, colorEdges=mode != 'QWC')
+
+    if adjacencyFile is None:
+        del packedAdjacency
+        os.remove(path)
+
+    return graph, edgeColors
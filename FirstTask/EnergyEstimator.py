@@ -0,0 +1,201 @@
+import numpy as np
+from PauliOperator import WalshHadamardTransform
+from MeasurementCircuits import CompileFamilies
+from ShotAllocation import FamilyVariances
+
+'''
+This file contains the estimation of the energy from measurements of the families, to compare the cost of Naive, QWC and GC.
+
+Every family f is measured with its circuit U_f (MeasurementCircuits.py) in the computational basis. For an outcome b, all members are known:
+P_t = sign_t (-1)^popcount(z_t & b), so one shot gives the value of the whole family
+
+                v_f(b) = sum_{t in f}  w_t sign_t (-1)^popcount(z_t & b)
+
+For a statevector, v_f is computed for all 2^n outcomes at once with a Walsh-Hadamard transform, and the outcome distribution
+|U_f psi|^2 is computed once. Afterwards, every estimate only draws the outcomes (binary search in the cumulative distribution) and
+averages v_f, for all repetitions of the experiment in one numpy call per family. If a family gets more shots than there are outcomes,
+the counts of all 2^n outcomes are drawn instead (multinomial) and v_f is weighted with them, so the memory does not grow with the shots.
+
+The energy is sum_f mean(v_f), its error bar is sqrt(sum_f Var(v_f) / N_f) with the sample variances, so every family needs two shots.
+A string in several families (e.g. from OverlappingFamilies) gets its weight split evenly over them.
+'''
+
+
+def _FamilyValueTable(circuit, familyWeights):
+    '''
+    v_f(b) for all outcomes b (statevector order, first qubit = most significant bit)
+    '''
+    bitValues = 1 << np.arange(circuit.nQ - 1, -1, -1, dtype=np.int64)
+    zMasks = circuit.zBits.astype(np.int64) @ bitValues
+
+    coefficients = np.zeros(2**circuit.nQ)
+    np.add.at(coefficients, zMasks, familyWeights * circuit.signs)
+
+    return WalshHadamardTransform(coefficients).real
+
+
+class GroupedEstimator:
+    '''
+    Attributes:
+        families:       list of families (lists of strings)
+        circuits:       MeasurementCircuit of every family
+        familyWeights:  weights of the members of every family (split if a string is in several families)
+    '''
+
+    def __init__(self, weights: dict, families: list, state = None, sampler = None, cache = None):
+        '''
+        Accepts:
+            weights:    dict {paulistring: weight}
+            families:   families from find_max_clique / PartitionFamilies, or [[t] for t in weights] for the naive measurement
+            state:      statevector (basis order as PauliStringToMatrix)
+            sampler:    instead of a state: sampler(circuit, shots, repetitions) -> int array (repetitions, shots) of outcomes,
+                        e.g. a stand in for hardware. circuit is the MeasurementCircuit of the family
+            cache:      optional CircuitCache for the circuits
+        '''
+        if (state is None) == (sampler is None):
+            raise ValueError('either a state or a sampler is needed')
+
+        occurrences = {}
+        for family in families:
+            for pauliString in family:
+                occurrences[pauliString] = occurrences.get(pauliString, 0) + 1
+
+        missing = [pauliString for pauliString in weights if pauliString not in occurrences]
+        if missing:
+            raise ValueError(str(len(missing)) + ' strings are not in any family, e.g. ' + missing[0])
+
+        self.families = [list(family) for family in families]
+        self.familyWeights = [np.array([weights[label] / occurrences[label] for label in family], dtype=np.float64) for family in families]
+        self.circuits = CompileFamilies(self.families, cache)
+        self.sampler = sampler
+
+        self._distributions, self._values = None, None
+        if state is not None:
+            state = np.asarray(state, dtype=np.complex128)
+            self._distributions, self._values = [], []
+
+            for circuit, familyWeights in zip(self.circuits, self.familyWeights):
+                probabilities = np.abs(circuit.ApplyToState(state))**2
+                cumulative = np.cumsum(probabilities)
+                self._distributions.append(cumulative / cumulative[-1])
+                self._values.append(_FamilyValueTable(circuit, familyWeights))
+
+
+    def FamilyShots(self, totalShots: int):
+        '''
+        two shots per family, the rest split proportional to the upper bound of sigma_f (see ShotAllocation.py).
+        Rounded by largest remainders, so the shots add up to totalShots exactly
+        '''
+        nFamilies = len(self.families)
+        if totalShots < 2*nFamilies:
+            raise ValueError('every family needs at least two shots, ' + str(totalShots) + ' shots are too few for ' + str(nFamilies) + ' families')
+
+        # FamilyVariances takes the weights in the order of the flattened families
+        standardDeviations = np.sqrt(FamilyVariances(self.families, np.concatenate(self.familyWeights)))
+        if standardDeviations.sum() == 0:
+            standardDeviations = np.ones(nFamilies)
+
+        remaining = int(totalShots) - 2*nFamilies
+        shares = remaining * standardDeviations / standardDeviations.sum()
+        extraShots = np.floor(shares).astype(np.int64)
+
+        leftover = remaining - int(extraShots.sum())
+        extraShots[np.argsort(-(shares - extraShots), kind='stable')[:leftover]] += 1
+
+        return 2 + extraShots
+
+
+    def _Outcomes(self, family: int, shots: int, repetitions: int, rng):
+        if self.sampler is not None:
+            return np.asarray(self.sampler(self.circuits[family], shots, repetitions), dtype=np.int64).reshape(repetitions, shots)
+
+        distribution = self._distributions[family]
+        return np.searchsorted(distribution, rng.random((repetitions, shots)), side='right').clip(max=len(distribution) - 1)
+
+
+    def _FamilyValues(self, family: int, outcomes):
+        if self._values is not None:
+            return self._values[family][outcomes]
+
+        circuit = self.circuits[family]
+        return (circuit.MemberValues(outcomes.ravel()) @ self.familyWeights[family]).reshape(outcomes.shape)
+
+
+    def _FamilyMoments(self, family: int, shots: int, repetitions: int, rng):
+        '''
+        mean and sample variance of v_f over the shots, for every repetition
+        '''
+        if self._values is not None and shots > len(self._values[family]):
+            # counts of every outcome: (repetitions, 2^n) numbers instead of (repetitions, shots) outcomes
+            probabilities = np.diff(self._distributions[family], prepend=0.).clip(min=0.)
+            counts = rng.multinomial(shots, probabilities / probabilities.sum(), size=repetitions)
+
+            values = self._values[family]
+            means = counts @ values / shots
+            return means, np.maximum(0., (counts @ values**2 - shots * means**2) / (shots - 1))
+
+        values = self._FamilyValues(family, self._Outcomes(family, shots, repetitions, rng))
+        return values.mean(axis=1), values.var(axis=1, ddof=1)
+
+
+    def Estimate(self, shots, repetitions: int = 1, seed = None) -> dict:
+        '''
+        Accepts:
+            shots:          total number of shots (split with FamilyShots), or an array of shots per family (e.g. from AllocateShots),
+                            at least two per family
+            repetitions:    number of independent experiments, all drawn at once
+            seed:           seed or np.random.Generator
+
+        Returns:
+            dict with 'energy' and 'error' (arrays of length repetitions), 'shots' per family and 'executions' per experiment
+        '''
+        rng = np.random.default_rng(seed)
+        familyShots = self.FamilyShots(shots) if np.ndim(shots) == 0 else np.asarray(shots, dtype=np.int64)
+
+        energies = np.zeros(repetitions)
+        variances = np.zeros(repetitions)
+
+        for family, nShots in enumerate(familyShots):
+            if nShots < 2:
+                raise ValueError('every family needs at least two shots for the error bar, not ' + str(nShots))
+
+            means, familyVariances = self._FamilyMoments(family, int(nShots), repetitions, rng)
+            energies += means
+            variances += familyVariances / nShots
+
+        return {
+            'energy': energies,
+            'error': np.sqrt(variances),
+            'shots': familyShots,
+            'executions': int(familyShots.sum()),
+        }
+
+
+    def ExactEnergy(self) -> float:
+        '''
+        sum_f <v_f>, the value the estimates scatter around (only for a statevector)
+        '''
+        if self._values is None:
+            raise ValueError('the exact energy needs a statevector')
+
+        return float(sum(np.dot(np.diff(distribution, prepend=0.), values) for distribution, values in zip(self._distributions, self._values)))
+
+
+def CompareEstimators(weights: dict, state, familiesQWC: list, familiesGC: list, shots: int, repetitions: int = 1000, seed = None) -> dict:
+    '''
+    mean, standard deviation and mean error bar of the energy for the naive, QWC and GC measurement with the same total number of shots
+    '''
+    rng = np.random.default_rng(seed)
+    results = {}
+
+    for name, families in (('naive', [[pauliString] for pauliString in weights]), ('QWC', familiesQWC), ('GC', familiesGC)):
+        estimate = GroupedEstimator(weights, families, state).Estimate(shots, repetitions, rng)
+        results[name] = {
+            'mean': float(estimate['energy'].mean()),
+            'std': float(estimate['energy'].std()),
+            'meanError': float(estimate['error'].mean()),
+            'families': len(families),
+            'executions': estimate['executions'],
+        }
+
+    return results
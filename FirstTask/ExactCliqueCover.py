@@ -0,0 +1,246 @@
+import time
+import numpy as np
+from CommutationMatrix import AsAdjacency
+from FamilyPartition import PartitionFamilies
+
+'''
+This file contains an exact minimum clique cover of the commutation graph, to benchmark the heuristics (find_max_clique, PartitionFamilies).
+
+A minimum clique cover of the commutation graph is a minimum coloring of its complement (the "does not commute" graph).
+The coloring is found with a DSATUR branch and bound:
+
+    - the strings are stored as bitsets (python ints) of their non commuting partners, a family is a bitset of its members
+    - the upper bound is the best cover found so far, starting with the greedy DSATUR cover of PartitionFamilies
+    - the lower bound is a set of mutually non commuting strings (a clique in the complement), which all need different families
+    - in every node, the most constrained uncolored strings are greedily colored in the commutation graph. Every color class is a set
+      of mutually non commuting strings, every existing family takes at most one of them, so at least (size - maximum matching of the
+      class to the existing families) new families are needed. The node is pruned if this reaches the gap to the best cover.
+      The same bound (without existing families, i.e. the largest color class) tightens the root lower bound
+    - in every node, the string that fits in the fewest families is branched on
+
+Only sensible for small Hamiltonians. With QWC, ~200 strings are solved in seconds. With GC, the largest set of mutually non commuting
+strings is often much smaller than the number of families (e.g. 10 vs 17 for 120 strings on 8 qubits), and no bound built from such sets
+can close this gap, so only ~60 strings are proven optimal in seconds.
+The search stops after timeLimit seconds and returns the best cover so far. Such a cover is not necessarily minimal: MinimumCliqueCover
+always returns the lower bound and whether the cover is proven optimal with it, and callers should report the gap (e.g. GroupingBenchmark).
+'''
+
+
+class _TimeUp(Exception):
+    pass
+
+
+def _BitsetsFromAdjacency(adjacency):
+    '''
+    bitset of the non commuting partners of every string
+    '''
+    nTerms = adjacency.shape[0]
+    conflicts = ~adjacency
+    np.fill_diagonal(conflicts, False)
+
+    return [int.from_bytes(np.packbits(row, bitorder='little').tobytes(), 'little') for row in conflicts], nTerms
+
+
+def _Members(bitset: int) -> list:
+    members = []
+    while bitset:
+        lowest = bitset & -bitset
+        members.append(lowest.bit_length() - 1)
+        bitset ^= lowest
+    return members
+
+
+def _GreedyConflictClique(conflicts: list, nTerms: int) -> list:
+    '''
+    large set of mutually non commuting strings, grown greedily from every start string. Lower bound for the number of families
+    '''
+    degrees = [bin(conflict).count('1') for conflict in conflicts]
+    bestClique = []
+
+    for start in range(nTerms):
+        clique = [start]
+        candidates = conflicts[start]
+
+        while candidates:
+            # take the candidate with the most non commuting partners among the candidates
+            members = _Members(candidates)
+            nextString = max(members, key=lambda i: (bin(conflicts[i] & candidates).count('1'), degrees[i]))
+            clique.append(nextString)
+            candidates &= conflicts[nextString]
+
+        if len(clique) > len(bestClique):
+            bestClique = clique
+
+    return bestClique
+
+
+def _MatchingSize(fits: list) -> int:
+    '''
+    maximum number of strings that can be placed in different existing families, fits[k] = bitset of the families string k fits in
+    '''
+    familyOwner = {}
+
+    def Augment(k: int, visited: set) -> bool:
+        for f in _Members(fits[k]):
+            if f in visited:
+                continue
+            visited.add(f)
+            if f not in familyOwner or Augment(familyOwner[f], visited):
+                familyOwner[f] = k
+                return True
+        return False
+
+    return sum(1 for k in range(len(fits)) if Augment(k, set()))
+
+
+def _FamiliesFitting(blocked: list, uncolored: int) -> dict:
+    '''
+    {uncolored string: bitset of the existing families it fits in}, blocked[f] = strings that do not commute with a member of family f
+    '''
+    fits = dict.fromkeys(_Members(uncolored), 0)
+    for f, blockedStrings in enumerate(blocked):
+        for i in _Members(uncolored & ~blockedStrings):
+            fits[i] |= 1 << f
+    return fits
+
+
+def _ColoringBound(fits: dict, conflicts: list, target: int = None) -> int:
+    '''
+    lower bound on the number of new families the uncolored strings need, fits as from _FamiliesFitting.
+    Stops as soon as the bound reaches target (enough to prune).
+
+    The uncolored strings are greedily colored in the commutation graph (most constrained strings first), every color class is a
+    clique of mutually non commuting strings. Its members all need different families, and every existing family takes at most one
+    of them, so at least (size - maximum matching of its members to the existing families) of them need new families.
+    '''
+    # a string that fits in no family needs a new one, this is all a node with one family left to open needs
+    if target == 1 and 0 in fits.values():
+        return 1
+
+    # most constrained first, as in DSATUR. Strings that fit in more than target families are left out, they can rarely be matched
+    # to too few families. The bound stays valid, it is the bound of a subset
+    counts = {i: bin(fitting).count('1') for i, fitting in fits.items()}
+    order = sorted((i for i in fits if target is None or counts[i] <= target), key=counts.__getitem__)
+
+    # every color class: strings that conflict with all members, the families its members fit in
+    colorClasses = []
+    for i in order:
+        for colorClass in colorClasses:
+            if colorClass[0] >> i & 1:
+                colorClass[0] &= conflicts[i]
+                colorClass[1].append(fits[i])
+                break
+        else:
+            colorClasses.append([conflicts[i], [fits[i]]])
+
+    bound = 0
+    for _, memberFits in colorClasses:
+        # a class with at most bound (or less than target) members cannot raise the bound (to target)
+        if len(memberFits) > bound and (target is None or len(memberFits) >= target):
+            bound = max(bound, len(memberFits) - _MatchingSize(memberFits))
+            if target is not None and bound >= target:
+                break
+
+    return bound
+
+
+def MinimumCliqueCover(graph, timeLimit: float = 10., labels = None):
+    '''
+    Accepts:
+        graph:          graph from create_Graph_QWC / create_Graph_GC, or a boolean adjacency matrix
+        timeLimit:      wall clock budget in seconds
+        labels:         node labels if an adjacency matrix is given
+
+    Returns:
+        families:       best cover found, list of families (lists of Pauli strings) as returned by find_max_clique.
+                        Only minimal if isOptimal, otherwise it can be far above lowerBound (e.g. 19 vs 10 for 120 GC strings)
+        lowerBound:     no cover with fewer families exists
+        isOptimal:      True if the search finished, then len(families) == lowerBound
+    '''
+    deadline = time.perf_counter() + timeLimit
+
+    adjacency, labels = AsAdjacency(graph, labels)
+    if len(labels) == 0:
+        return [], 0, True
+
+    conflicts, nTerms = _BitsetsFromAdjacency(adjacency)
+
+    # upper bound: greedy cover
+    greedyFamilies = PartitionFamilies(adjacency, 'dsatur')
+    best = {'classes': [sum(1 << i for i in family) for family in greedyFamilies]}
+
+    # lower bound: mutually non commuting strings, they also fix the first families (symmetry breaking)
+    clique = _GreedyConflictClique(conflicts, nTerms)
+    lowerBound = max(len(clique), _ColoringBound(_FamiliesFitting([], (1 << nTerms) - 1), conflicts))
+
+    nodeCount = [0]
+
+    # blocked[f]: strings that do not commute with some member of family f, kept next to the classes
+    def Search(classes: list, blocked: list, uncolored: int):
+        nodeCount[0] += 1
+        if nodeCount[0] % 256 == 0 and time.perf_counter() > deadline:
+            raise _TimeUp()
+
+        if len(classes) >= len(best['classes']):
+            return
+
+        if uncolored == 0:
+            best['classes'] = list(classes)
+            return
+
+        fits = _FamiliesFitting(blocked, uncolored)
+        gap = len(best['classes']) - len(classes)
+        if _ColoringBound(fits, conflicts, gap) >= gap:
+            return
+
+        # DSATUR: the string that fits in the fewest families, ties broken by non commuting partners among the uncolored
+        chosen, chosenKey = -1, (-1, -1)
+        for i, fitting in fits.items():
+            saturation = len(classes) - bin(fitting).count('1')
+            if saturation == len(classes):
+                # can only go into a new family, no need to look further
+                chosen = i
+                break
+            key = (saturation, bin(conflicts[i] & uncolored).count('1'))
+            if key > chosenKey:
+                chosen, chosenKey = i, key
+
+        bit = 1 << chosen
+        remaining = uncolored ^ bit
+
+        for f in _Members(fits[chosen]):
+            blockedBefore = blocked[f]
+            classes[f] |= bit
+            blocked[f] |= conflicts[chosen]
+            Search(classes, blocked, remaining)
+            classes[f] ^= bit
+            blocked[f] = blockedBefore
+
+            if len(best['classes']) == lowerBound:
+                return
+
+        if len(classes) + 1 < len(best['classes']):
+            classes.append(bit)
+            blocked.append(conflicts[chosen])
+            Search(classes, blocked, remaining)
+            classes.pop()
+            blocked.pop()
+
+    isOptimal = len(best['classes']) == lowerBound
+
+    if not isOptimal:
+        initialClasses = [1 << i for i in clique]
+        uncolored = ((1 << nTerms) - 1) ^ sum(initialClasses)
+
+        try:
+            Search(initialClasses, [conflicts[i] for i in clique], uncolored)
+            isOptimal = True
+        except _TimeUp:
+            isOptimal = False
+
+    families = [[labels[i] for i in _Members(members)] for members in best['classes']]
+
+    if isOptimal:
+        lowerBound = len(families)
+
+    return families, lowerBound, isOptimal
@@ -0,0 +1,148 @@
+import numpy as np
+from CommutationMatrix import AsAdjacency
+
+'''
+This file contains a replacement for find_max_clique.
+
+Partitioning the Pauli strings into as few commuting families as possible is the same as coloring the complement of the commutation graph:
+two strings get the same color (family) only if they commute.
+
+find_max_clique enumerates all maximal cliques in every step, which is exponential. Here, greedy coloring strategies are used instead:
+
+    'largest_first':      strings with the most non commuting partners first
+    'dsatur':             always the string that is blocked from the most families so far (Brelaz)
+    'sorted_insertion':   strings with the largest |weight| first, every string goes into the first family it fits in
+
+For every family, a boolean column stores which strings still commute with all of its members.
+So finding a family for a string is one lookup in a row of this array, and adding a string to a family is one AND with its adjacency row.
+'''
+
+PARTITION_STRATEGIES = ('largest_first', 'dsatur', 'sorted_insertion')
+
+
+class _FamilyColumns:
+    '''
+    (nTerms x nFamilies) boolean array, entry [i, f] is True if string i commutes with all members of family f
+    '''
+
+    def __init__(self, nTerms: int):
+        self.compatible = np.zeros((nTerms, 16), dtype=bool)
+        self.nFamilies = 0
+
+    def FirstCompatible(self, index: int) -> int:
+        '''
+        index of the first family the string fits in, -1 if there is none
+        '''
+        row = self.compatible[index, :self.nFamilies]
+        family = int(np.argmax(row)) if self.nFamilies > 0 else 0
+        return family if self.nFamilies > 0 and row[family] else -1
+
+    def NewFamily(self, adjacencyRow) -> int:
+        if self.nFamilies == self.compatible.shape[1]:
+            self.compatible = np.concatenate((self.compatible, np.zeros_like(self.compatible)), axis=1)
+
+        self.compatible[:, self.nFamilies] = adjacencyRow
+        self.nFamilies += 1
+        return self.nFamilies - 1
+
+    def Join(self, family: int, adjacencyRow):
+        self.compatible[:, family] &= adjacencyRow
+
+
+def _Order(adjacency, strategy: str, weights):
+    if strategy == 'largest_first':
+        # number of non commuting strings = degree in the complement graph. Stable sort, so ties stay in input order
+        return np.argsort(adjacency.sum(axis=1), kind='stable')
+
+    if strategy == 'sorted_insertion':
+        if weights is None:
+            raise ValueError('sorted_insertion needs the weights of the Pauli strings')
+        return np.argsort(-np.abs(weights), kind='stable')
+
+    raise ValueError('strategy has to be one of ' + str(PARTITION_STRATEGIES) + ', not ' + str(strategy))
+
+
+def _ColorInOrder(adjacency, order):
+    nTerms = adjacency.shape[0]
+    families = _FamilyColumns(nTerms)
+    familyOfTerm = np.empty(nTerms, dtype=np.int64)
+
+    for index in order:
+        family = families.FirstCompatible(index)
+
+        if family == -1:
+            family = families.NewFamily(adjacency[index])
+        else:
+            families.Join(family, adjacency[index])
+
+        familyOfTerm[index] = family
+
+    return familyOfTerm
+
+
+def _ColorDSATUR(adjacency):
+    nTerms = adjacency.shape[0]
+    families = _FamilyColumns(nTerms)
+    familyOfTerm = np.full(nTerms, -1, dtype=np.int64)
+
+    # saturation = number of existing families a string can not join anymore
+    saturation = np.zeros(nTerms, dtype=np.int64)
+    complementDegree = (nTerms - 1) - adjacency.sum(axis=1)
+
+    # key for choosing the next string: saturation first, then complement degree. Colored strings get -1
+    scale = nTerms + 1
+
+    for _ in range(nTerms):
+        key = saturation*scale + complementDegree
+        key[familyOfTerm != -1] = -1
+        index = int(np.argmax(key))
+
+        family = families.FirstCompatible(index)
+
+        if family == -1:
+            family = families.NewFamily(adjacency[index])
+
+            # all strings not commuting with this one are blocked from the new family
+            saturation += ~adjacency[index]
+        else:
+            newlyBlocked = families.compatible[:, family] & ~adjacency[index]
+            families.Join(family, adjacency[index])
+            saturation += newlyBlocked
+
+        familyOfTerm[index] = family
+
+    return familyOfTerm
+
+
+def PartitionFamilies(graph, strategy: str = 'dsatur', weights = None, labels = None) -> list:
+    '''
+    Partitions the Pauli strings into commuting families by greedily coloring the complement of the commutation graph.
+
+    Accepts:
+        graph:      graph from create_Graph_QWC / create_Graph_GC, a boolean adjacency matrix (e.g. from BuildAdjacency) or bit packed rows
+                    (e.g. the memory map of BuildAdjacencyParallel), which are unpacked one row at a time
+        strategy:   'largest_first', 'dsatur' or 'sorted_insertion'
+        weights:    dict {paulistring: weight} as used by SummedWeight, or an array in the order of the labels. Needed for sorted_insertion
+        labels:     node labels if an adjacency matrix is given, default 0, ..., n-1
+
+    Returns:
+        list of families, every family is a list of Pauli strings. Same format as find_max_clique
+    '''
+    adjacency, labels = AsAdjacency(graph, labels, keepPacked=True)
+
+    if len(labels) == 0:
+        return []
+
+    if isinstance(weights, dict):
+        weights = np.array([weights[label] for label in labels])
+
+    if strategy == 'dsatur':
+        familyOfTerm = _ColorDSATUR(adjacency)
+    else:
+        familyOfTerm = _ColorInOrder(adjacency, _Order(adjacency, strategy, weights))
+
+    families = [[] for _ in range(familyOfTerm.max() + 1)]
+    for label, family in zip(labels, familyOfTerm):
+        families[family].append(label)
+
+    return families
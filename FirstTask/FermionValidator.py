@@ -0,0 +1,158 @@
+import numpy as np
+from PauliTable import PauliTable, Popcount, PackBits, UnpackBits
+
+'''
+This file contains a generalized version of check_Paulistring: it checks for every Pauli string if it can come from a fermionic
+Hamiltonian with at most maxBody body terms, for any number of qubits, and returns a mask of all invalid strings.
+
+Jordan Wigner, with mode p on qubit p (the p-th character of the string):
+
+                a_p^dagger = 1/2 (X_p - i Y_p) Z_0 ... Z_(p-1),         n_p = 1/2 (1 - Z_p)
+
+A product of creation / annihilation operators gives X or Y on every mode that appears once, I or Z on modes that appear twice (number
+operators), and the Jordan strings Z_0 ... Z_(p-1) of all modes that appear once. The Jordan strings cancel pairwise, so on the qubits that
+are not X or Y, a valid string is
+
+                Z on the qubits between the 1st and 2nd, 3rd and 4th, ... X / Y   XOR   Z on at most (maxBody - #XY/2) number operators
+
+So a string is valid iff
+    - the number of X / Y is even and at most 2 maxBody
+    - its z mask, outside the X / Y qubits, differs from the Jordan strings in at most maxBody - #XY/2 qubits
+
+The Jordan strings are an exclusive prefix XOR of the x mask, done with shifts on the packed words. Everything is vectorized over all strings.
+
+Parity and Bravyi Kitaev are linear encodings |n> -> |A n> (mod 2), a CNOT circuit. A string of the encoding has the Jordan Wigner masks
+
+                x_JW = A^-1 x,      z_JW = A^T z
+
+so the strings are mapped back to Jordan Wigner first.
+'''
+
+ENCODINGS = ('jordan_wigner', 'parity', 'bravyi_kitaev')
+
+
+def EncodingMatrix(nQ: int, encoding: str = 'jordan_wigner'):
+    '''
+    boolean (nQ, nQ) matrix A of the encoding, qubit j stores the parity of the modes k with A[j, k]
+
+        'jordan_wigner':    A = identity
+        'parity':           qubit j stores the parity of the modes 0 ... j
+        'bravyi_kitaev':    qubit j stores the parity of the modes j + 1 - lowbit(j + 1) ... j (Fenwick tree), for any nQ
+    '''
+    if encoding not in ENCODINGS:
+        raise ValueError('encoding has to be one of ' + str(ENCODINGS) + ', not ' + str(encoding))
+
+    rows, columns = np.indices((nQ, nQ))
+
+    if encoding == 'jordan_wigner':
+        return rows == columns
+    if encoding == 'parity':
+        return columns <= rows
+
+    lowestBit = (rows + 1) & -(rows + 1)
+    return (columns <= rows) & (columns >= rows + 1 - lowestBit)
+
+
+def _InverseGF2(matrix):
+    '''
+    inverse of an invertible boolean matrix over GF(2), by Gauss Jordan elimination
+    '''
+    size = matrix.shape[0]
+    augmented = np.concatenate((matrix, np.eye(size, dtype=bool)), axis=1)
+
+    for column in range(size):
+        pivot = column + int(np.argmax(augmented[column:, column]))
+        if not augmented[pivot, column]:
+            raise ValueError('the encoding matrix is not invertible')
+
+        augmented[[column, pivot]] = augmented[[pivot, column]]
+        eliminate = augmented[:, column].copy()
+        eliminate[column] = False
+        augmented[eliminate] ^= augmented[column]
+
+    return augmented[:, size:]
+
+
+def _ApplyGF2(matrix, words, nQ: int, chunkSize: int = 2**16):
+    '''
+    matrix @ bits (mod 2) for the bit vector of every row of words, in chunks. The sums are exact in float32 for any realistic nQ
+    '''
+    result = np.empty_like(words)
+    transposed = matrix.T.astype(np.float32)
+
+    for start in range(0, words.shape[0], chunkSize):
+        bits = UnpackBits(words[start:start + chunkSize], nQ).astype(np.float32)
+        result[start:start + chunkSize] = PackBits((bits @ transposed).astype(np.int64) & 1 == 1)
+
+    return result
+
+
+def ToJordanWigner(pauliStrings, encoding: str = 'jordan_wigner') -> PauliTable:
+    '''
+    Jordan Wigner strings (as a PauliTable, without labels) of strings given in the parity or Bravyi Kitaev encoding
+    '''
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    if encoding == 'jordan_wigner':
+        return table
+
+    matrix = EncodingMatrix(table.nQ, encoding)
+    xBits = _ApplyGF2(_InverseGF2(matrix), table.xBits, table.nQ)
+    zBits = _ApplyGF2(matrix.T, table.zBits, table.nQ)
+
+    return PauliTable.FromMasks(xBits, zBits, table.nQ)
+
+
+def FromJordanWigner(pauliStrings, encoding: str = 'jordan_wigner') -> PauliTable:
+    '''
+    inverse of ToJordanWigner: x = A x_JW, z = A^-T z_JW. As X^x Z^z products, the strings are mapped exactly.
+    For the strings themselves (Y = i X Z), the sign changes by i^(popcount(x_JW & z_JW) - popcount(x & z))
+    '''
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    if encoding == 'jordan_wigner':
+        return table
+
+    matrix = EncodingMatrix(table.nQ, encoding)
+    xBits = _ApplyGF2(matrix, table.xBits, table.nQ)
+    zBits = _ApplyGF2(_InverseGF2(matrix).T, table.zBits, table.nQ)
+
+    return PauliTable.FromMasks(xBits, zBits, table.nQ)
+
+
+def _ExclusivePrefixParity(words):
+    '''
+    bit q of the result is the parity of the bits 0 ... q-1 of the row (over all words, qubit q = bit q)
+    '''
+    prefix = words.copy()
+    for shift in (1, 2, 4, 8, 16, 32):
+        prefix ^= prefix << np.uint64(shift)
+
+    # the parity of all earlier words flips the whole word
+    wordParity = (prefix >> np.uint64(63)).astype(bool)
+    carry = np.logical_xor.accumulate(wordParity, axis=1) ^ wordParity
+    prefix = np.where(carry, ~prefix, prefix)
+
+    return prefix ^ words
+
+
+def InvalidTerms(pauliStrings, encoding: str = 'jordan_wigner', maxBody: int = 2):
+    '''
+    Accepts:
+        pauliStrings:   list of Pauli strings or PauliTable (e.g. from LoadHamiltonian)
+        encoding:       'jordan_wigner', 'parity' or 'bravyi_kitaev'
+        maxBody:        highest order of the fermionic terms (2 for molecular Hamiltonians)
+
+    Returns:
+        boolean array, True for every string that cannot come from the encoding. Use np.nonzero on it to get the indices
+    '''
+    table = ToJordanWigner(pauliStrings, encoding)
+    x, z = table.xBits, table.zBits
+
+    # qubits beyond nQ in the last word
+    validBits = PackBits(np.ones((1, table.nQ), dtype=bool))
+
+    numberXY = Popcount(x).sum(axis=1).astype(np.int64)
+
+    jordanStrings = _ExclusivePrefixParity(x)
+    numberOperators = Popcount((z ^ jordanStrings) & ~x & validBits).sum(axis=1).astype(np.int64)
+
+    return (numberXY % 2 == 1) | (numberXY > 2*maxBody) | (numberOperators > maxBody - numberXY//2)
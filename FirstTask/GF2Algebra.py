@@ -0,0 +1,135 @@
+from PauliTable import PauliTable
+
+'''
+This file contains linear algebra over GF(2) on the symplectic vectors of Pauli strings.
+
+A Pauli string on nQ qubits is written as the 2nQ bit vector (x | z), stored in one python int: x in the lower nQ bits, z in the upper nQ bits.
+Multiplying two Pauli strings adds their vectors mod 2 (up to a phase). Therefore:
+
+    - multiplicative independence:  no string of the clique is (up to a phase) a product of the others
+                                    <=> the vectors are linearly independent over GF(2)
+
+    - linear independence:          alpha p_1 + beta p_2 + ... = 0  iff  alpha, beta, ... = 0 (as in checkLinearIndependency)
+                                    Different Pauli strings are orthogonal under the trace inner product, so this only fails for
+                                    repeated strings. No 2^n x 2^n matrices are needed for this.
+
+The rank is computed by Gaussian elimination, keeping one basis vector per pivot bit. Every vector is reduced with at most k XORs of 2nQ bit ints,
+so checking k strings costs O(nQ k^2) bit operations.
+'''
+
+
+def SymplecticVectors(pauliStrings) -> list:
+    '''
+    returns the (x | z) vector of every string as python int, x in the lower nQ bits
+    '''
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    xInts, zInts = table.ToIntegers()
+
+    return [x | (z << table.nQ) for x, z in zip(xInts, zInts)]
+
+
+class GF2Basis:
+    '''
+    Incrementally built basis of a subspace of GF(2)^m, vectors are python ints.
+    Every basis vector is stored under its highest set bit (pivot), so reducing a vector is one pass over the pivots from high to low.
+    '''
+
+    def __init__(self):
+        self.pivots = {}
+
+
+    def __len__(self):
+        return len(self.pivots)
+
+
+    def Reduce(self, vector: int) -> int:
+        '''
+        returns the vector after removing all components in the span of the basis. 0 if the vector is in the span
+        '''
+        while vector:
+            pivot = vector.bit_length() - 1
+            if pivot not in self.pivots:
+                return vector
+            vector ^= self.pivots[pivot]
+        return 0
+
+
+    def Contains(self, vector: int) -> bool:
+        return self.Reduce(vector) == 0
+
+
+    def Add(self, vector: int) -> bool:
+        '''
+        adds the vector to the basis, returns False (and does nothing) if it is already in the span
+        '''
+        reduced = self.Reduce(vector)
+        if reduced == 0:
+            return False
+
+        self.pivots[reduced.bit_length() - 1] = reduced
+        return True
+
+
+    def Vectors(self) -> list:
+        return list(self.pivots.values())
+
+
+def GF2Rank(vectors: list) -> int:
+    '''
+    rank over GF(2) of a list of vectors (python ints)
+    '''
+    basis = GF2Basis()
+    for vector in vectors:
+        basis.Add(vector)
+
+    return len(basis)
+
+
+def IndependentSubset(vectors: list):
+    '''
+    Goes through the vectors in order and keeps every vector that is independent of the ones kept before.
+
+    Returns:
+        independentIndices:     indices of the kept vectors, a basis of the span
+        dependentIndices:       indices of the vectors that are in the span of the vectors before them
+    '''
+    basis = GF2Basis()
+    independentIndices, dependentIndices = [], []
+
+    for index, vector in enumerate(vectors):
+        if basis.Add(vector):
+            independentIndices.append(index)
+        else:
+            dependentIndices.append(index)
+
+    return independentIndices, dependentIndices
+
+
+def FindDependentStrings(clique: list, multiplicative: bool = False) -> list:
+    '''
+    Accepts:
+        clique:             list of Pauli strings
+        multiplicative:     if False, test linear independence of the matrices (as checkLinearIndependency), i.e. find repeated strings.
+                            If True, also strings that are a product of earlier strings (and the identity) count as dependent
+
+    Returns:
+        list of the strings that can be dropped (or have to be repaired), such that the rest of the clique is independent.
+        Empty if the clique is independent.
+    '''
+    if len(clique) == 0:
+        return []
+
+    vectors = SymplecticVectors(clique)
+
+    if multiplicative:
+        _, dependentIndices = IndependentSubset(vectors)
+    else:
+        # '1' and 'I' are the same matrix, so compare the vectors, not the strings
+        seen = set()
+        dependentIndices = []
+        for index, vector in enumerate(vectors):
+            if vector in seen:
+                dependentIndices.append(index)
+            seen.add(vector)
+
+    return [clique[index] for index in dependentIndices]
@@ -0,0 +1,267 @@
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from PauliTable import PauliTable, PackBits
+from FermionValidator import InvalidTerms
+from CommutationMatrix import BuildAdjacency
+from FamilyPartition import PartitionFamilies
+from ExactCliqueCover import MinimumCliqueCover
+from ImplicitGrouping import ImplicitFamilies
+from QWCIndex import QWCFamilies
+from GF2Algebra import FindDependentStrings
+from HamiltonianLoader import LoadHamiltonian
+from IntegralHamiltonian import LoadIntegralHamiltonian
+
+'''
+This file contains a benchmark of the grouping for growing Hamiltonians (see the ideas at the bottom of CreateGraph.py).
+
+For every Hamiltonian (random Jordan Wigner like terms, or loaded from files) every stage is timed, with its peak memory (tracemalloc):
+
+    validate:       InvalidTerms (Jordan Wigner structure)
+    graphQWC/GC:    dense boolean commutation matrix (BuildAdjacency, n^2 bytes), only up to --graph-limit terms
+    partitionQWC/GC DSATUR coloring of the matrix, or the grouping without graph (QWCFamilies, ImplicitFamilies) above the limit
+    exactQWC/GC:    MinimumCliqueCover of the matrix, only up to --exact-limit terms. Reports the lower bound and whether the cover is
+                    proven optimal, so the gap of a cover that ran out of time is visible
+    independence:   multiplicative independence of every GC family (FindDependentStrings)
+
+One row per Hamiltonian and stage is written to a .csv or .json file. With --baseline, the times are compared to an earlier result file
+and slower stages (or more families) are reported as regressions; the exit code is then 1.
+
+    python GroupingBenchmark.py --qubits 4 8 16 30 60 --terms 10 100 1000 10000 100000 --output results.json
+    python GroupingBenchmark.py --output new.json --baseline results.json
+'''
+
+STAGES = ('validate', 'graphQWC', 'partitionQWC', 'exactQWC', 'graphGC', 'partitionGC', 'exactGC', 'independence')
+
+
+def RandomJordanWignerHamiltonian(nQ: int, nTerms: int, seed = None):
+    '''
+    random terms with the structure of one and two body Jordan Wigner terms (hopping X/Y pairs with their Z strings, number operators).
+    Fewer terms are returned if there are not enough different ones on nQ qubits
+    '''
+    rng = np.random.default_rng(seed)
+    nCandidates = 2*nTerms + 16
+
+    # up to 4 different modes per term, in random order
+    modes = np.argsort(rng.random((nCandidates, nQ)), axis=1)[:, :min(4, nQ)]
+    nXY = rng.choice([0, 2, 4], size=nCandidates)
+    nXY = np.minimum(nXY, (modes.shape[1] // 2) * 2)
+
+    rows = np.arange(nCandidates)[:, None]
+    isXY = np.arange(modes.shape[1])[None, :] < nXY[:, None]
+    # the remaining modes are number operators (1 - Z) / 2, each gives I or Z
+    isNumber = ~isXY & (np.arange(modes.shape[1])[None, :] < nXY[:, None] + (4 - nXY[:, None]) // 2) & (rng.random(modes.shape) < 0.5)
+
+    x = np.zeros((nCandidates, nQ), dtype=bool)
+    x[np.broadcast_to(rows, modes.shape)[isXY], modes[isXY]] = True
+
+    # Jordan strings: Z between the 1st and 2nd, 3rd and 4th X / Y, then Y instead of X at random, then the number operators
+    z = (np.cumsum(x, axis=1) - x) % 2 == 1
+    z &= ~x
+    z |= x & (rng.random(x.shape) < 0.5)
+    z[np.broadcast_to(rows, modes.shape)[isNumber], modes[isNumber]] ^= True
+
+    xBits, zBits = PackBits(x), PackBits(z)
+    keys = np.ascontiguousarray(np.concatenate((xBits, zBits), axis=1)).view(np.dtype((np.void, 16*xBits.shape[1]))).ravel()
+    _, first = np.unique(keys, return_index=True)
+    keep = np.sort(first)[:nTerms]
+
+    table = PauliTable.FromMasks(xBits[keep], zBits[keep], nQ)
+    return table, rng.normal(size=len(keep))
+
+
+def _Timed(stage: str, results: dict, trackMemory: bool, function, *arguments):
+    if trackMemory:
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+
+    begin = time.perf_counter()
+    value = function(*arguments)
+    results[stage] = {'seconds': time.perf_counter() - begin}
+
+    if trackMemory:
+        results[stage]['peakBytes'] = tracemalloc.get_traced_memory()[1] - start
+
+    return value
+
+
+def BenchmarkHamiltonian(table: PauliTable, graphLimit: int = 10000, trackMemory: bool = True, exactLimit: int = 0,
+                         exactTime: float = 5.) -> dict:
+    '''
+    runs all stages for one Hamiltonian, the exact cover only up to exactLimit terms with a budget of exactTime seconds
+
+    Returns:
+        dict {stage: {'seconds', 'peakBytes', 'families' (partition and exact stages), 'method', 'lowerBound' and 'proven' (exact stages)}}
+    '''
+    results = {}
+    labels = list(table)
+    useGraph = len(table) <= graphLimit
+    useExact = useGraph and len(table) <= exactLimit
+
+    if trackMemory:
+        tracemalloc.start()
+
+    try:
+        invalid = _Timed('validate', results, trackMemory, InvalidTerms, table)
+        results['validate']['invalid'] = int(invalid.sum())
+
+        for mode in ('QWC', 'GC'):
+            if useGraph:
+                adjacency = _Timed('graph' + mode, results, trackMemory, BuildAdjacency, table, mode)
+                families = _Timed('partition' + mode, results, trackMemory, PartitionFamilies, adjacency, 'dsatur', None, labels)
+                results['partition' + mode]['method'] = 'dsatur'
+
+                if useExact:
+                    exact, lowerBound, proven = _Timed('exact' + mode, results, trackMemory, MinimumCliqueCover, adjacency, exactTime, labels)
+                    results['exact' + mode].update({'families': len(exact), 'lowerBound': int(lowerBound), 'proven': bool(proven)})
+                del adjacency
+            else:
+                grouping = QWCFamilies if mode == 'QWC' else (lambda strings: ImplicitFamilies(strings, 'GC'))
+                families = _Timed('partition' + mode, results, trackMemory, grouping, table)
+                results['partition' + mode]['method'] = 'implicit'
+
+            results['partition' + mode]['families'] = len(families)
+
+        dependent = _Timed('independence', results, trackMemory, lambda: sum(len(FindDependentStrings(family, True)) for family in families))
+        results['independence']['dependent'] = int(dependent)
+
+    finally:
+        if trackMemory:
+            tracemalloc.stop()
+
+    return results
+
+
+def _Rows(name: str, table: PauliTable, results: dict) -> list:
+    rows = []
+    for stage in STAGES:
+        if stage not in results:
+            continue
+        row = {'hamiltonian': name, 'qubits': table.nQ, 'terms': len(table), 'stage': stage}
+        row.update(results[stage])
+        rows.append(row)
+    return rows
+
+
+def WriteResults(rows: list, path: str):
+    '''
+    .json: list of rows, otherwise csv with one column per key
+    '''
+    if path.endswith('.json'):
+        with open(path, 'w') as file:
+            json.dump(rows, file, indent=1)
+        return
+
+    columns = []
+    for row in rows:
+        columns += [key for key in row if key not in columns]
+
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def ReadResults(path: str) -> list:
+    if path.endswith('.json'):
+        with open(path, 'r') as file:
+            return json.load(file)
+
+    with open(path, 'r', newline='') as file:
+        rows = list(csv.DictReader(file))
+
+    # csv has no types
+    for row in rows:
+        for key in ('seconds', 'peakBytes', 'families', 'lowerBound'):
+            if row.get(key) not in (None, ''):
+                row[key] = float(row[key])
+        if row.get('proven') not in (None, ''):
+            row['proven'] = row['proven'] == 'True'
+    return rows
+
+
+def FindRegressions(rows: list, baseline: list, tolerance: float = 0.5, minimumSeconds: float = 0.05) -> list:
+    '''
+    rows (same Hamiltonian and stage as in the baseline) that are more than tolerance slower, or that give more families.
+    Stages faster than minimumSeconds are ignored, their times are mostly noise
+    '''
+    reference = {(row['hamiltonian'], row['stage']): row for row in baseline}
+    regressions = []
+
+    for row in rows:
+        old = reference.get((row['hamiltonian'], row['stage']))
+        if old is None:
+            continue
+
+        seconds, oldSeconds = float(row['seconds']), float(old['seconds'])
+        if seconds > minimumSeconds and seconds > (1 + tolerance)*oldSeconds:
+            regressions.append(dict(row, reason='time', baselineSeconds=oldSeconds))
+
+        if row.get('families') is not None and old.get('families') not in (None, '') and float(row['families']) > float(old['families']):
+            regressions.append(dict(row, reason='families', baselineFamilies=old['families']))
+
+    return regressions
+
+
+def _LoadFile(path: str):
+    if path.endswith('.npz'):
+        return LoadIntegralHamiltonian(path)
+    return LoadHamiltonian(path)
+
+
+def Main(arguments = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark of the QWC / GC grouping stages for growing Hamiltonians')
+    parser.add_argument('--qubits', type=int, nargs='*', default=[4, 8, 16, 30, 60])
+    parser.add_argument('--terms', type=int, nargs='*', default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--hamiltonian', nargs='*', default=[], help='term files (LoadHamiltonian) or integral .npz files')
+    parser.add_argument('--graph-limit', type=int, default=10000, help='above this many terms, the grouping runs without graph')
+    parser.add_argument('--exact-limit', type=int, default=0, help='up to this many terms, the exact cover is computed as well')
+    parser.add_argument('--exact-time', type=float, default=5., help='time budget in seconds of every exact cover')
+    parser.add_argument('--no-memory', action='store_true', help='do not track the peak memory (tracemalloc slows Python loops down)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='grouping_benchmark.csv', help='.csv or .json')
+    parser.add_argument('--baseline', default=None, help='earlier result file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative slowdown before a stage counts as regression')
+    options = parser.parse_args(arguments)
+
+    cases = []
+    for nQ in options.qubits:
+        for nTerms in options.terms:
+            cases.append(('random_q' + str(nQ) + '_t' + str(nTerms), lambda nQ=nQ, nTerms=nTerms: RandomJordanWignerHamiltonian(nQ, nTerms, options.seed)))
+    for path in options.hamiltonian:
+        cases.append((os.path.basename(path), lambda path=path: _LoadFile(path)))
+
+    rows = []
+    for name, load in cases:
+        table, _ = load()
+        results = BenchmarkHamiltonian(table, options.graph_limit, not options.no_memory, options.exact_limit, options.exact_time)
+        rows += _Rows(name, table, results)
+
+        summary = ', '.join(stage + ' ' + str(np.round(results[stage]['seconds'], 3)) + 's' for stage in STAGES if stage in results)
+        print(name + ' (' + str(len(table)) + ' terms): ' + summary + ', families QWC / GC: '
+              + str(results['partitionQWC']['families']) + ' / ' + str(results['partitionGC']['families']))
+
+        for stage in ('exactQWC', 'exactGC'):
+            if stage in results:
+                exact = results[stage]
+                print('    ' + stage + ': ' + str(exact['families']) + ' families, '
+                      + ('proven optimal' if exact['proven'] else 'not proven, lower bound ' + str(exact['lowerBound'])))
+
+    WriteResults(rows, options.output)
+
+    if options.baseline is not None:
+        regressions = FindRegressions(rows, ReadResults(options.baseline), options.tolerance)
+        for regression in regressions:
+            print('REGRESSION', regression['hamiltonian'], regression['stage'], regression['reason'])
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(Main())
@@ -0,0 +1,197 @@
+import os
+import hashlib
+import zipfile
+import tempfile
+import numpy as np
+from PauliTable import PauliTable
+from CommutationMatrix import BuildAdjacency, COMMUTATION_MODES
+from FamilyPartition import PartitionFamilies
+
+'''
+This file contains an on-disk cache for the commuting families, so the same Hamiltonian is not regrouped over and over (e.g. in VQE sweeps).
+
+The families only depend on the set of Pauli strings and the commutation mode ('QWC', 'GC', 'without_QWC'). The key is a sha256 hash of
+the mode and the sorted, packed X/Z masks. So the order of the strings and '1' vs 'I' do not matter.
+
+Every entry is one .npz file in the cache directory. The families are stored as indices into the sorted strings, and translated back to the
+strings of the caller on a hit. If the directory grows above maxBytes, the least recently used files are deleted.
+'''
+
+
+def PackedKeys(table: PauliTable):
+    '''
+    returns the X and Z masks of every string as one sortable key
+    '''
+    keys = np.ascontiguousarray(np.concatenate((table.xBits, table.zBits), axis=1).astype('<u8'))
+    return keys.view(np.dtype((np.void, keys.shape[1]*8))).ravel()
+
+
+def CanonicalOrder(table: PauliTable):
+    '''
+    returns the sorted unique packed keys and, for every unique key, the index of its first occurrence in the table
+    '''
+    uniqueKeys, firstIndex = np.unique(PackedKeys(table), return_index=True)
+
+    return uniqueKeys, firstIndex
+
+
+def DefaultFamilies(pauliStrings, mode: str) -> list:
+    '''
+    families as computed on a cache miss if no other function is given: vectorized adjacency + DSATUR coloring
+    '''
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+
+    return PartitionFamilies(BuildAdjacency(table, mode), 'dsatur', labels=list(table))
+
+
+class GroupingCache:
+    '''
+    Attributes:
+        directory:      folder of the .npz files
+        maxBytes:       size cap of the folder
+        hits, misses:   statistics of this cache object
+    '''
+
+    def __init__(self, directory: str, maxBytes: int = 2**30):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+
+    def Key(self, pauliStrings, mode: str) -> str:
+        table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+        uniqueKeys, _ = CanonicalOrder(table)
+        return self._Key(table.nQ, uniqueKeys, mode)
+
+
+    def _Key(self, nQ: int, uniqueKeys, mode: str) -> str:
+        if mode not in COMMUTATION_MODES:
+            raise ValueError('mode has to be one of ' + str(COMMUTATION_MODES) + ', not ' + str(mode))
+
+        hasher = hashlib.sha256()
+        hasher.update((mode + ':' + str(nQ) + ':').encode('ascii'))
+        hasher.update(uniqueKeys.tobytes())
+        return hasher.hexdigest()
+
+
+    def _Path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npz')
+
+
+    def Get(self, pauliStrings, mode: str):
+        '''
+        returns the cached families (lists of the given strings), or None on a miss
+        '''
+        table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+        uniqueKeys, firstIndex = CanonicalOrder(table)
+        path = self._Path(self._Key(table.nQ, uniqueKeys, mode))
+
+        try:
+            with np.load(path) as entry:
+                members, offsets = entry['members'], entry['offsets']
+        except (FileNotFoundError, OSError, KeyError, ValueError, zipfile.BadZipFile):
+            self.misses += 1
+            return None
+
+        # mark as recently used for the LRU eviction, another process may have evicted it since the load
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+
+        labels = [table[i] for i in firstIndex[members]]
+        return [labels[offsets[f]:offsets[f+1]] for f in range(len(offsets) - 1)]
+
+
+    def Put(self, pauliStrings, mode: str, families: list):
+        '''
+        stores families (lists of strings from pauliStrings) for this set of strings and mode
+        '''
+        table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+        uniqueKeys, _ = CanonicalOrder(table)
+        key = self._Key(table.nQ, uniqueKeys, mode)
+
+        # position of every member in the sorted unique strings, found by its masks. So the spelling ('1' or 'I') does not matter
+        memberStrings = [pauliString for family in families for pauliString in family]
+        members = np.zeros(0, dtype=np.int64)
+        if memberStrings:
+            memberKeys = PackedKeys(PauliTable(memberStrings))
+            members = np.searchsorted(uniqueKeys, memberKeys).clip(max=len(uniqueKeys) - 1).astype(np.int64)
+            if np.any(uniqueKeys[members] != memberKeys):
+                raise ValueError('the families contain strings that are not in pauliStrings')
+
+        offsets = np.cumsum([0] + [len(family) for family in families]).astype(np.int64)
+
+        # write to a temporary file first, so other processes never read half written entries
+        fileDescriptor, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fileDescriptor, 'wb') as file:
+            np.savez(file, members=members, offsets=offsets)
+        path = self._Path(key)
+        os.replace(temporaryPath, path)
+
+        self._Evict(path)
+
+
+    def GetOrCompute(self, pauliStrings, mode: str, compute = None) -> list:
+        '''
+        returns the cached families, or computes them with compute(pauliStrings, mode) (default: DefaultFamilies) and stores them
+        '''
+        families = self.Get(pauliStrings, mode)
+        if families is not None:
+            return families
+
+        if compute is None:
+            compute = DefaultFamilies
+
+        families = compute(pauliStrings, mode)
+        self.Put(pauliStrings, mode, families)
+        return families
+
+
+    def _Entries(self) -> list:
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                status = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        return entries
+
+
+    def _Evict(self, keep: str):
+        '''
+        deletes the least recently used entries until the folder fits into maxBytes, except keep (the entry that was just written)
+        '''
+        entries = sorted(self._Entries())
+        totalBytes = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if totalBytes <= self.maxBytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            totalBytes -= size
+
+
+    def Statistics(self) -> dict:
+        entries = self._Entries()
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits / lookups if lookups > 0 else 0.,
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+        }
@@ -0,0 +1,210 @@
+import numpy as np
+from PauliTable import PauliTable, PackPauliStrings
+
+'''
+This file contains a loader for large files of Pauli terms, instead of the hardcoded lists in CreateGraph.py and the notebook.
+
+Two formats are supported:
+
+    text:       one term per line, "coefficient PAULISTRING", e.g. "-0.0457 XXYY". Empty lines and lines starting with # are skipped
+
+    binary:     header:  8 bytes b'PAULIHAM', then uint32 nQ and uint32 nWords (little endian)
+                records: nWords uint64 x words, nWords uint64 z words, float64 coefficient (see SaveHamiltonianBinary)
+
+The file is read in chunks. Every chunk is packed into X/Z masks at once, and identical strings are merged by summing their coefficients
+in a hash table keyed by the packed masks. No list of all strings is built.
+
+The result is a PauliTable (and the coefficient array). The table can be passed to check_Paulistring, create_Graph_QWC / create_Graph_GC
+(and therefore find_max_clique), BuildAdjacency and PartitionFamilies.
+'''
+
+BINARY_MAGIC = b'PAULIHAM'
+
+# number of lines / records that are packed at once
+CHUNK_SIZE = 2**16
+
+
+class TermAccumulator:
+    '''
+    hash table {packed masks: row}, with the masks and summed coefficients in growing arrays.
+    The coefficients are float64, or complex128 for terms that are only real after summing (e.g. in IntegralHamiltonian.py)
+    '''
+
+    def __init__(self, nWords: int, dtype = np.float64):
+        self.nWords = nWords
+        self.rowOfKey = {}
+        self.xBits = np.zeros((CHUNK_SIZE, nWords), dtype=np.uint64)
+        self.zBits = np.zeros((CHUNK_SIZE, nWords), dtype=np.uint64)
+        self.coefficients = np.zeros(CHUNK_SIZE, dtype=dtype)
+        self.nTerms = 0
+
+
+    def _Grow(self, needed: int):
+        capacity = self.xBits.shape[0]
+        if needed <= capacity:
+            return
+        newCapacity = max(needed, 2*capacity)
+        for name in ('xBits', 'zBits', 'coefficients'):
+            old = getattr(self, name)
+            new = np.zeros((newCapacity,) + old.shape[1:], dtype=old.dtype)
+            new[:capacity] = old
+            setattr(self, name, new)
+
+
+    def AddChunk(self, xBits, zBits, coefficients):
+        # merge the duplicates inside the chunk with numpy first, then the rest goes through the hash table
+        keys = np.ascontiguousarray(np.concatenate((xBits, zBits), axis=1)).view(np.dtype((np.void, 16*self.nWords))).ravel()
+        uniqueKeys, firstIndex, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=np.real(coefficients), minlength=len(uniqueKeys))
+        if np.iscomplexobj(self.coefficients):
+            summed = summed + 1j*np.bincount(inverse.ravel(), weights=np.imag(coefficients), minlength=len(uniqueKeys))
+
+        self._Grow(self.nTerms + len(uniqueKeys))
+
+        rows = np.empty(len(uniqueKeys), dtype=np.int64)
+        for i, key in enumerate(uniqueKeys.tolist()):
+            row = self.rowOfKey.get(key)
+            if row is None:
+                row = self.nTerms
+                self.rowOfKey[key] = row
+                self.nTerms += 1
+            rows[i] = row
+
+        self.xBits[rows] = xBits[firstIndex]
+        self.zBits[rows] = zBits[firstIndex]
+        np.add.at(self.coefficients, rows, summed)
+
+
+    def Result(self, nQ: int, dropZeros: bool, tolerance: float):
+        xBits, zBits = self.xBits[:self.nTerms], self.zBits[:self.nTerms]
+        coefficients = self.coefficients[:self.nTerms]
+
+        if dropZeros:
+            keep = np.abs(coefficients) > tolerance
+            xBits, zBits, coefficients = xBits[keep], zBits[keep], coefficients[keep]
+
+        return PauliTable.FromMasks(xBits, zBits, nQ), coefficients.copy()
+
+
+def _TextChunks(path: str):
+    '''
+    yields (coefficients, strings) for CHUNK_SIZE lines at a time
+    '''
+    coefficients, strings = [], []
+
+    with open(path, 'r') as file:
+        for lineNumber, line in enumerate(file, 1):
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+
+            fields = line.split()
+            if len(fields) != 2:
+                raise ValueError(path + ': line ' + str(lineNumber) + ' is not "<coefficient> <pauli string>"')
+
+            coefficient, pauliString = fields
+            coefficients.append(float(coefficient))
+            strings.append(pauliString)
+
+            if len(strings) == CHUNK_SIZE:
+                yield np.array(coefficients), strings
+                coefficients, strings = [], []
+
+    if len(strings) > 0:
+        yield np.array(coefficients), strings
+
+
+def LoadHamiltonianText(path: str, dropZeros: bool = True, tolerance: float = 0.):
+    '''
+    Accepts:
+        path:           text file with one "coefficient PAULISTRING" per line
+        dropZeros:      remove terms whose summed coefficient is (almost) zero
+        tolerance:      terms with |coefficient| <= tolerance count as zero
+
+    Returns:
+        table:          PauliTable of the unique strings
+        coefficients:   float64 array of the summed coefficients
+    '''
+    accumulator, nQ = None, None
+
+    for coefficients, strings in _TextChunks(path):
+        xBits, zBits, chunkQ = PackPauliStrings(strings)
+
+        if accumulator is None:
+            nQ = chunkQ
+            accumulator = TermAccumulator(xBits.shape[1])
+        elif chunkQ != nQ:
+            raise ValueError('all Pauli strings in ' + path + ' have to be of the same size')
+
+        accumulator.AddChunk(xBits, zBits, coefficients)
+
+    if accumulator is None:
+        raise ValueError(path + ' does not contain any Pauli terms')
+
+    return accumulator.Result(nQ, dropZeros, tolerance)
+
+
+def _BinaryRecordType(nWords: int):
+    return np.dtype([('x', '<u8', (nWords,)), ('z', '<u8', (nWords,)), ('coefficient', '<f8')])
+
+
+def SaveHamiltonianBinary(path: str, table: PauliTable, coefficients):
+    '''
+    writes the terms in the binary format described at the top of this file
+    '''
+    nWords = table.xBits.shape[1]
+    records = np.zeros(len(table), dtype=_BinaryRecordType(nWords))
+    records['x'] = table.xBits
+    records['z'] = table.zBits
+    records['coefficient'] = coefficients
+
+    with open(path, 'wb') as file:
+        file.write(BINARY_MAGIC)
+        file.write(np.array([table.nQ, nWords], dtype='<u4').tobytes())
+        records.tofile(file)
+
+
+def LoadHamiltonianBinary(path: str, dropZeros: bool = True, tolerance: float = 0.):
+    '''
+    same as LoadHamiltonianText, for the binary format
+    '''
+    with open(path, 'rb') as file:
+        if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            raise ValueError(path + ' is not a binary Pauli term file')
+
+        header = file.read(8)
+        if len(header) < 8:
+            raise ValueError(path + ' does not contain any Pauli terms')
+
+        nQ, nWords = (int(value) for value in np.frombuffer(header, dtype='<u4'))
+        recordType = _BinaryRecordType(nWords)
+        accumulator = TermAccumulator(nWords)
+        nRecords = 0
+
+        while True:
+            records = np.fromfile(file, dtype=recordType, count=CHUNK_SIZE)
+            if len(records) == 0:
+                break
+
+            nRecords += len(records)
+            accumulator.AddChunk(records['x'].astype(np.uint64).reshape(-1, nWords),
+                                 records['z'].astype(np.uint64).reshape(-1, nWords),
+                                 records['coefficient'].astype(np.float64))
+
+    if nRecords == 0:
+        raise ValueError(path + ' does not contain any Pauli terms')
+
+    return accumulator.Result(nQ, dropZeros, tolerance)
+
+
+def LoadHamiltonian(path: str, dropZeros: bool = True, tolerance: float = 0.):
+    '''
+    loads a text or binary term file, the format is recognized from the first bytes
+    '''
+    with open(path, 'rb') as file:
+        isBinary = file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+    if isBinary:
+        return LoadHamiltonianBinary(path, dropZeros, tolerance)
+
+    return LoadHamiltonianText(path, dropZeros, tolerance)
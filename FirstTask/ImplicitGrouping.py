@@ -0,0 +1,163 @@
+import numpy as np
+from PauliTable import PauliTable, Popcount
+from GF2Algebra import GF2Basis
+from QWCIndex import QWCIndex, _Supports
+
+'''
+This file contains a greedy grouping into commuting families that never builds the commutation graph, not even as a bit packed matrix.
+
+Every string goes into the first family it commutes with completely (the same result as PartitionFamilies(..., 'sorted_insertion')),
+but instead of comparing the string to all other strings, it is only compared to a few masks per family:
+
+    'QWC':  a family is stored as its merged basis, the single qubit Pauli of its members on every qubit (or free). A string fits if,
+            on the qubits both act on, its single qubit Paulis are the same as the ones of the family. The first such family is looked up
+            in the per (qubit, Pauli) bitsets of the blocked families (QWCIndex.py), so the other families are never touched.
+
+    'GC':   the symplectic product is bilinear, so a string commutes with all members of a family iff it commutes with a basis of their span
+            (as GF(2) vectors, see GF2Algebra.py). A family of commuting strings on nQ qubits has at most nQ independent vectors,
+            so only the members that are not a product of earlier members are stored, as rows of one stacked array.
+
+            A string commutes with every family that does not act on its support, so the per qubit bitsets of the families acting on it
+            give the first such family, an upper bound of the result. Only the families before it have to be checked, with a few vectorized
+            operations on their rows. This saves most of the work for local strings (a few families before the bound), but not for
+            Jordan Wigner strings: their Z strings overlap almost every family, and a string ends up in one of the last families
+            in most cases, so these are checked against all rows at once. The rows are at most nQ per family, not one per string.
+
+Memory is O(n nQ) bits instead of the O(n^2) of the commutation matrix.
+'''
+
+IMPLICIT_MODES = ('QWC', 'GC')
+
+
+class MaskRows:
+    '''
+    stacked x and z masks (rows x words), and the family each row belongs to. The arrays are doubled when they are full
+    '''
+
+    def __init__(self, nWords: int):
+        self.x = np.zeros((16, nWords), dtype=np.uint64)
+        self.z = np.zeros((16, nWords), dtype=np.uint64)
+        self.family = np.zeros(16, dtype=np.int64)
+        self.nRows = 0
+
+    def Append(self, x, z, family: int) -> int:
+        if self.nRows == len(self.family):
+            self.x = np.concatenate((self.x, np.zeros_like(self.x)))
+            self.z = np.concatenate((self.z, np.zeros_like(self.z)))
+            self.family = np.concatenate((self.family, np.zeros_like(self.family)))
+
+        self.x[self.nRows], self.z[self.nRows], self.family[self.nRows] = x, z, family
+        self.nRows += 1
+        return self.nRows - 1
+
+
+def _FirstCompatibleGC(rows: MaskRows, rowsOfFamily: list, acting: list, qubits, x, z) -> int:
+    '''
+    first family the string commutes with, -1 if there is none. acting[q] is the bitset of the families with a row acting on qubit q
+    '''
+    nFamilies = len(rowsOfFamily)
+    overlapping = 0
+    for qubit in qubits:
+        overlapping |= acting[qubit]
+
+    # the first family on other qubits fits in any case, so only the families before it (all overlapping) have to be checked
+    free = ~overlapping & ((1 << nFamilies) - 1)
+    firstFree = (free & -free).bit_length() - 1 if free != 0 else nFamilies
+    if firstFree == 0:
+        return 0 if nFamilies > 0 else -1
+
+    # few of them (local strings): only their rows, otherwise all rows at once
+    if 8*firstFree <= nFamilies:
+        checked = np.concatenate(rowsOfFamily[:firstFree])
+    else:
+        checked = slice(0, rows.nRows)
+
+    anticommuting = (Popcount((x & rows.z[checked]) ^ (z & rows.x[checked])).sum(axis=1) & 1).astype(bool)
+
+    blocked = np.zeros(nFamilies, dtype=bool)
+    blocked[rows.family[checked][anticommuting]] = True
+
+    family = int(np.argmin(blocked))
+    return family if not blocked[family] else -1
+
+
+def AssignFamilies(table: PauliTable, mode: str, order) -> np.ndarray:
+    '''
+    places the strings with the given indices, in this order, each into the first family it fits in
+
+    Returns:
+        int array (len(table),), family of every string, -1 for strings that are not in order
+    '''
+    if mode not in IMPLICIT_MODES:
+        raise ValueError('mode has to be one of ' + str(IMPLICIT_MODES) + ', not ' + str(mode))
+
+    familyOfTerm = np.full(len(table), -1, dtype=np.int64)
+
+    if mode == 'QWC':
+        index = QWCIndex(table.nQ)
+        for term, qubits, paulis in _Supports(table, order):
+            familyOfTerm[term] = index.Add(term, qubits, paulis)
+        return familyOfTerm
+
+    rows = MaskRows(table.xBits.shape[1])
+    rowsOfFamily = []
+    acting = [0] * table.nQ
+    # GF(2) basis of the span of every family, vectors as in GF2Algebra.SymplecticVectors
+    spans = []
+    xInts, zInts = table.ToIntegers()
+
+    for term, qubits, _ in _Supports(table, order):
+        x, z = table.xBits[term], table.zBits[term]
+
+        family = _FirstCompatibleGC(rows, rowsOfFamily, acting, qubits, x, z)
+        if family == -1:
+            family = len(rowsOfFamily)
+            rowsOfFamily.append([])
+            spans.append(GF2Basis())
+
+        # strings in the span of the family commute with everything the family commutes with, they need no row
+        if spans[family].Add(xInts[term] | (zInts[term] << table.nQ)):
+            rowsOfFamily[family].append(rows.Append(x, z, family))
+            for qubit in qubits:
+                acting[qubit] |= 1 << family
+
+        familyOfTerm[term] = family
+
+    return familyOfTerm
+
+
+def ImplicitFamilies(pauliStrings, mode: str = 'GC', weights = None) -> list:
+    '''
+    Accepts:
+        pauliStrings:   list of Pauli strings or PauliTable
+        mode:           'QWC' or 'GC'
+        weights:        optional dict {paulistring: weight} or array. If given, the strings with the largest |weight| are placed first,
+                        otherwise the strings are placed in the given order
+
+    Returns:
+        list of families (lists of strings), the format of find_max_clique. Repeated strings are only placed once
+    '''
+    if mode not in IMPLICIT_MODES:
+        raise ValueError('mode has to be one of ' + str(IMPLICIT_MODES) + ', not ' + str(mode))
+
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    labels = list(table)
+
+    if weights is None:
+        order = np.arange(len(table))
+    else:
+        if isinstance(weights, dict):
+            weights = np.array([weights[label] for label in labels])
+        order = np.argsort(-np.abs(weights), kind='stable')
+
+    # first occurrence of every string
+    placed = set()
+    order = [index for index in order if not (labels[index] in placed or placed.add(labels[index]))]
+
+    familyOfTerm = AssignFamilies(table, mode, order)
+
+    families = [[] for _ in range(familyOfTerm.max() + 1 if len(order) > 0 else 0)]
+    for index in order:
+        families[familyOfTerm[index]].append(labels[index])
+
+    return families
@@ -0,0 +1,223 @@
+from PauliTable import PauliTable
+from CommutationMatrix import COMMUTATION_MODES
+
+'''
+This file contains a partition into commuting families that can be updated when Pauli strings are added or removed,
+instead of rerunning create_Graph_GC -> find_max_clique for every small change of the Hamiltonian
+(active space tweaks, truncation of small weights, ...).
+
+    - an added string goes into the first family it commutes with completely, or into a new family
+    - a removed string leaves its family. The family is still a clique, it is then repaired:
+      if all its remaining members fit into other families, it is dissolved, so the number of families can go down again
+
+Only the affected families are touched. Every compatibility test of a string against one string (GC) or one family (QWC) is counted,
+and compared to the n(n-1)/2 pairs a full rebuild of the commutation graph would need.
+
+For QWC, a family is stored as its merged basis (which of X, Y, Z every qubit is measured in), so a string is checked against a whole
+family with a few bit operations. For GC, the string is checked against the members.
+'''
+
+
+class IncrementalPartition:
+    '''
+    Attributes:
+        mode:           'QWC', 'GC' or 'without_QWC'
+        statistics:     dict with the number of operations, compatibility checks done and the checks a full rebuild would have needed
+    '''
+
+    def __init__(self, families: list = None, mode: str = 'GC'):
+        '''
+        Accepts:
+            families:   start partition, e.g. from find_max_clique or PartitionFamilies. The families are trusted to be commuting
+            mode:       'QWC', 'GC' or 'without_QWC'
+        '''
+        if mode not in COMMUTATION_MODES:
+            raise ValueError('mode has to be one of ' + str(COMMUTATION_MODES) + ', not ' + str(mode))
+
+        self.mode = mode
+        self.nQ = None
+
+        # label -> (x, z) as python ints
+        self.masks = {}
+        # family id -> list of labels, label -> family id
+        self.families = {}
+        self.familyOf = {}
+        # QWC only: family id -> [x, z] merged over all members
+        self.mergedBasis = {}
+
+        self._nextFamilyId = 0
+        self.statistics = {'operations': 0, 'checks': 0, 'rebuildChecks': 0, 'familiesRepaired': 0}
+
+        for family in (families or []):
+            familyId = self._NewFamily()
+            for label in family:
+                self._StoreMasks(label)
+                self._AddToFamily(label, familyId)
+
+
+    def _StoreMasks(self, label: str):
+        table = PauliTable([label])
+        if self.nQ is None:
+            self.nQ = table.nQ
+        elif table.nQ != self.nQ:
+            raise ValueError('all Pauli strings have to be of the same size')
+
+        xInts, zInts = table.ToIntegers()
+        self.masks[label] = (xInts[0], zInts[0])
+
+
+    def _NewFamily(self) -> int:
+        familyId = self._nextFamilyId
+        self._nextFamilyId += 1
+        self.families[familyId] = []
+        self.mergedBasis[familyId] = [0, 0]
+        return familyId
+
+
+    def _AddToFamily(self, label: str, familyId: int):
+        self.families[familyId].append(label)
+        self.familyOf[label] = familyId
+
+        x, z = self.masks[label]
+        self.mergedBasis[familyId][0] |= x
+        self.mergedBasis[familyId][1] |= z
+
+
+    def _RemoveFromFamily(self, label: str) -> int:
+        familyId = self.familyOf.pop(label)
+        self.families[familyId].remove(label)
+
+        if len(self.families[familyId]) == 0:
+            del self.families[familyId]
+            del self.mergedBasis[familyId]
+        elif self.mode == 'QWC':
+            mergedX, mergedZ = 0, 0
+            for member in self.families[familyId]:
+                mergedX |= self.masks[member][0]
+                mergedZ |= self.masks[member][1]
+            self.mergedBasis[familyId] = [mergedX, mergedZ]
+
+        return familyId
+
+
+    def _Fits(self, label: str, familyId: int) -> bool:
+        x, z = self.masks[label]
+
+        if self.mode == 'QWC':
+            self.statistics['checks'] += 1
+            mergedX, mergedZ = self.mergedBasis[familyId]
+
+            # on the qubits both act on, the single qubit Paulis have to be the same
+            overlap = (x | z) & (mergedX | mergedZ)
+            return ((x ^ mergedX) | (z ^ mergedZ)) & overlap == 0
+
+        for member in self.families[familyId]:
+            self.statistics['checks'] += 1
+            memberX, memberZ = self.masks[member]
+            nonCommutingCount = bin((x & memberZ) ^ (z & memberX)).count('1')
+
+            if nonCommutingCount % 2 == 1 or (self.mode == 'without_QWC' and nonCommutingCount == 0):
+                return False
+
+        return True
+
+
+    def _Place(self, label: str) -> int:
+        for familyId in self.families:
+            if self._Fits(label, familyId):
+                self._AddToFamily(label, familyId)
+                return familyId
+
+        familyId = self._NewFamily()
+        self._AddToFamily(label, familyId)
+        return familyId
+
+
+    def _CountOperation(self):
+        nTerms = len(self.familyOf)
+        self.statistics['operations'] += 1
+        self.statistics['rebuildChecks'] += nTerms*(nTerms - 1)//2
+
+
+    def Insert(self, pauliString: str) -> int:
+        '''
+        adds a string to the first compatible family (or a new one), returns the id of its family
+        '''
+        if pauliString in self.familyOf:
+            return self.familyOf[pauliString]
+
+        self._StoreMasks(pauliString)
+        familyId = self._Place(pauliString)
+        self._CountOperation()
+
+        return familyId
+
+
+    def Remove(self, pauliString: str):
+        '''
+        removes a string and repairs its family
+        '''
+        if pauliString not in self.familyOf:
+            raise KeyError(pauliString + ' is not in the partition')
+
+        familyId = self._RemoveFromFamily(pauliString)
+        del self.masks[pauliString]
+
+        if familyId in self.families:
+            self._Repair(familyId)
+
+        self._CountOperation()
+
+
+    def _Repair(self, familyId: int):
+        '''
+        tries to move all members of the family into other families. If one of them does not fit anywhere, nothing is changed
+        '''
+        members = list(self.families[familyId])
+        targets = []
+
+        for label in members:
+            target = next((other for other in self.families if other != familyId and self._Fits(label, other)), None)
+            if target is None:
+                return
+            targets.append(target)
+
+        # members are moved one after the other, so every move has to be checked against the members moved before it
+        moved = []
+        for label, target in zip(members, targets):
+            if not self._Fits(label, target):
+                for movedLabel in moved:
+                    self._RemoveFromFamily(movedLabel)
+                    self._AddToFamily(movedLabel, familyId)
+                return
+
+            self._RemoveFromFamily(label)
+            self._AddToFamily(label, target)
+            moved.append(label)
+
+        self.statistics['familiesRepaired'] += 1
+
+
+    def Update(self, added: list = (), removed: list = ()):
+        '''
+        removes and adds several strings, e.g. after changing a weight threshold
+        '''
+        for pauliString in removed:
+            self.Remove(pauliString)
+        for pauliString in added:
+            self.Insert(pauliString)
+
+
+    def Families(self) -> list:
+        '''
+        current families in the format of find_max_clique
+        '''
+        return [list(family) for family in self.families.values()]
+
+
+    def Statistics(self) -> dict:
+        statistics = dict(self.statistics)
+        statistics['families'] = len(self.families)
+        statistics['terms'] = len(self.familyOf)
+        statistics['checksAvoided'] = max(0, statistics['rebuildChecks'] - statistics['checks'])
+        return statistics
@@ -0,0 +1,134 @@
+import numpy as np
+from PauliTable import Popcount, PackBits
+from HamiltonianLoader import TermAccumulator, CHUNK_SIZE
+from FermionValidator import FromJordanWigner, ENCODINGS
+
+'''
+This file contains the generation of the qubit Hamiltonian from one and two electron integrals (in spin orbitals), without external tools
+and without Python strings:
+
+                H = constant + sum_pq h1[p, q] a_p^dagger a_q + sum_pqrs h2[p, q, r, s] a_p^dagger a_q^dagger a_r a_s
+
+(the convention of OpenFermion's InteractionOperator, the 1/2 of the two body term is part of h2).
+
+With Jordan Wigner, mode p on qubit p, and Y = i X Z, every ladder operator is a sum of two X^x Z^z products:
+
+                a_p^dagger = 1/2 (X_p + X_p Z_p) Z_0 ... Z_(p-1),       a_p = 1/2 (X_p - X_p Z_p) Z_0 ... Z_(p-1)
+
+In this form, products are easy:  X^x1 Z^z1 X^x2 Z^z2 = (-1)^popcount(z1 & x2) X^(x1 ^ x2) Z^(z1 ^ z2).
+So every integral gives 4 (one body) or 16 (two body) products, computed for a whole chunk of integrals at once on the packed masks.
+A product X^x Z^z is the Pauli string with the same masks times (-i)^popcount(x & z).
+
+The terms are merged in a hash table keyed by the masks (TermAccumulator of HamiltonianLoader.py), chunk by chunk.
+For parity / Bravyi Kitaev, the merged masks are mapped with FromJordanWigner, the sign of every string is corrected for its new Y's.
+'''
+
+
+def _LadderMasks(nQ: int):
+    '''
+    packed masks of X_p (single) and Z_0 ... Z_(p-1) (lower) for every mode p, shape (nQ, nWords)
+    '''
+    modes = np.arange(nQ)
+    single = PackBits(modes[:, None] == modes[None, :])
+    lower = PackBits(modes[None, :] < modes[:, None])
+    return single, lower
+
+
+def _LadderProducts(modes, daggers: tuple, coefficients, single, lower):
+    '''
+    all X^x Z^z products of the ladder operators for a chunk of integrals
+
+    Accepts:
+        modes:          (m, k) mode of every operator
+        daggers:        k bools, True for creation operators
+        coefficients:   (m,) integrals
+
+    Returns:
+        x, z of shape (m 2^k, nWords) and the coefficients of the products
+    '''
+    nIntegrals, nWords = len(coefficients), single.shape[1]
+    x = np.zeros((nIntegrals, 1, nWords), dtype=np.uint64)
+    z = np.zeros((nIntegrals, 1, nWords), dtype=np.uint64)
+    values = np.asarray(coefficients, dtype=np.result_type(coefficients, np.float64))[:, None]
+
+    for position, dagger in enumerate(daggers):
+        operatorX = single[modes[:, position]][:, None, :]
+        operatorZ = lower[modes[:, position]][:, None, :]
+
+        # multiplying from the right with X_p: the sign is (-1)^popcount(z & X_p)
+        signs = 1 - 2*(Popcount(z & operatorX).sum(axis=2) & 1).astype(np.float64)
+
+        x = np.concatenate((x ^ operatorX, x ^ operatorX), axis=1)
+        z = np.concatenate((z ^ operatorZ, z ^ operatorZ ^ operatorX), axis=1)
+        values = 0.5*np.concatenate((signs*values, (1. if dagger else -1.)*signs*values), axis=1)
+
+    return x.reshape(-1, nWords), z.reshape(-1, nWords), values.ravel()
+
+
+def _AddIntegrals(accumulator: TermAccumulator, integrals, daggers: tuple, single, lower, tolerance: float):
+    indices = np.nonzero(np.abs(integrals) > tolerance)
+    modes = np.stack(indices, axis=1)
+    values = integrals[indices]
+
+    chunkIntegrals = max(1, CHUNK_SIZE // 2**len(daggers))
+
+    for start in range(0, len(values), chunkIntegrals):
+        x, z, products = _LadderProducts(modes[start:start + chunkIntegrals], daggers, values[start:start + chunkIntegrals], single, lower)
+
+        # X^x Z^z = (-i)^popcount(x & z) P
+        phases = (-1j)**(Popcount(x & z).sum(axis=1) % 4)
+        accumulator.AddChunk(x, z, products*phases)
+
+
+def HamiltonianFromIntegrals(h1, h2 = None, constant: float = 0., encoding: str = 'jordan_wigner', tolerance: float = 1e-12):
+    '''
+    Accepts:
+        h1:             (n, n) one body integrals in spin orbitals
+        h2:             optional (n, n, n, n) two body integrals, H contains h2[p, q, r, s] a_p^dagger a_q^dagger a_r a_s
+        constant:       e.g. the nuclear repulsion, added as the identity string
+        encoding:       'jordan_wigner', 'parity' or 'bravyi_kitaev'
+        tolerance:      integrals and summed coefficients with absolute value <= tolerance are dropped
+
+    Returns:
+        table:          PauliTable of the unique strings (the labels are generated from the masks when needed)
+        coefficients:   float64 array (complex128 only if the integrals do not give a hermitian H)
+    '''
+    if encoding not in ENCODINGS:
+        raise ValueError('encoding has to be one of ' + str(ENCODINGS) + ', not ' + str(encoding))
+
+    h1 = np.asarray(h1)
+    nQ = h1.shape[0]
+    single, lower = _LadderMasks(nQ)
+
+    accumulator = TermAccumulator(single.shape[1], dtype=np.complex128)
+    accumulator.AddChunk(np.zeros_like(single[:1]), np.zeros_like(single[:1]), np.array([constant], dtype=np.complex128))
+
+    _AddIntegrals(accumulator, h1, (True, False), single, lower, tolerance)
+    if h2 is not None:
+        _AddIntegrals(accumulator, np.asarray(h2), (True, True, False, False), single, lower, tolerance)
+
+    table, coefficients = accumulator.Result(nQ, True, tolerance)
+
+    if encoding != 'jordan_wigner':
+        encoded = FromJordanWigner(table, encoding)
+        # P_JW = i^popcount(x_JW & z_JW) X^x_JW Z^z_JW  ->  i^(popcount(x_JW & z_JW) - popcount(x & z)) P, a sign for hermitian strings
+        powers = Popcount(table.xBits & table.zBits).sum(axis=1) - Popcount(encoded.xBits & encoded.zBits).sum(axis=1)
+        coefficients = coefficients * (1j)**(powers.astype(np.int64) % 4)
+        table = encoded
+
+    if np.all(np.abs(coefficients.imag) <= max(tolerance, 1e-12)):
+        coefficients = coefficients.real.copy()
+
+    return table, coefficients
+
+
+def LoadIntegralHamiltonian(path: str, encoding: str = 'jordan_wigner', tolerance: float = 1e-12):
+    '''
+    HamiltonianFromIntegrals for a .npz file with the arrays 'h1', optionally 'h2' and 'constant'
+    '''
+    with np.load(path) as data:
+        h1 = data['h1']
+        h2 = data['h2'] if 'h2' in data else None
+        constant = float(data['constant']) if 'constant' in data else 0.
+
+    return HamiltonianFromIntegrals(h1, h2, constant, encoding, tolerance)
@@ -0,0 +1,358 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+from PauliTable import PauliTable, UnpackBits
+from GF2Algebra import SymplecticVectors, IndependentSubset
+from GroupingCache import CanonicalOrder
+
+'''
+This file contains the measurement circuits of the families: a Clifford circuit U such that U P U^dagger = +-Z^z for every member P.
+After U, all members are measured at once in the computational basis.
+
+The circuit is found by Gaussian elimination on the symplectic matrix (X | Z) of an independent subset (generators) of the family.
+Multiplying generators (row operations) is free, gates act on the columns:
+
+    1.  H on single qubits until the X block has full rank (a generator without X gets an X on a qubit that is no pivot yet)
+    2.  CNOT(p_i, t) until the X block is the identity on the pivot qubits p_i and zero elsewhere
+    3.  S and CZ until the Z block is the identity on the pivot qubits (it is symmetric there, since the generators commute)
+    4.  CNOT(t, p_i) to clear Z on the other qubits, now every generator is Y on p_i
+    5.  S and H on every pivot qubit, the generators are Z on p_i
+
+The gates act on Pauli strings as in Aaronson, Gottesman (2004), including the signs, see ApplyClifford.
+A gate is a tuple ('H', q), ('S', q), ('CNOT', control, target) or ('CZ', a, b), qubit q = character q of the strings.
+
+Circuits can be cached (in memory and optionally on disk) by a hash of the family, see CircuitCache.
+'''
+
+TWO_QUBIT_GATES = ('CNOT', 'CZ')
+
+
+def _ApplyGate(gate: tuple, x, z, signs):
+    '''
+    P -> G P G^dagger for all rows of the boolean (n, nQ) arrays x, z and the signs (True = -1), in place
+    '''
+    name = gate[0]
+
+    if name == 'H':
+        q = gate[1]
+        signs ^= x[:, q] & z[:, q]
+        x[:, q], z[:, q] = z[:, q].copy(), x[:, q].copy()
+
+    elif name == 'S':
+        q = gate[1]
+        signs ^= x[:, q] & z[:, q]
+        z[:, q] ^= x[:, q]
+
+    elif name == 'CNOT':
+        control, target = gate[1], gate[2]
+        signs ^= x[:, control] & z[:, target] & ~(x[:, target] ^ z[:, control])
+        x[:, target] ^= x[:, control]
+        z[:, control] ^= z[:, target]
+
+    elif name == 'CZ':
+        a, b = gate[1], gate[2]
+        signs ^= x[:, a] & x[:, b] & (z[:, a] ^ z[:, b])
+        z[:, a] ^= x[:, b]
+        z[:, b] ^= x[:, a]
+
+    else:
+        raise ValueError('unknown gate ' + str(name))
+
+
+def ApplyClifford(gates: list, x, z, signs = None):
+    '''
+    conjugates Pauli strings by the circuit, P -> U P U^dagger
+
+    Accepts:
+        gates:      list of gates, applied in order
+        x, z:       boolean (n, nQ) arrays (e.g. UnpackBits of a PauliTable)
+        signs:      boolean (n,), True for a minus sign. Default: all +
+
+    Returns:
+        x, z, signs of the conjugated strings
+    '''
+    x, z = np.array(x, dtype=bool), np.array(z, dtype=bool)
+    signs = np.zeros(x.shape[0], dtype=bool) if signs is None else np.array(signs, dtype=bool)
+
+    for gate in gates:
+        _ApplyGate(gate, x, z, signs)
+
+    return x, z, signs
+
+
+def _EchelonX(x, z):
+    '''
+    row reduces the X block of the generators (rows of x and z together), in place
+
+    Returns:
+        pivot column of each row that has X (these rows come first), rows without X
+    '''
+    nRows, nQ = x.shape
+    pivots, row = [], 0
+
+    for column in range(nQ):
+        if row == nRows:
+            break
+        candidates = np.flatnonzero(x[row:, column])
+        if len(candidates) == 0:
+            continue
+
+        pivot = row + candidates[0]
+        x[[row, pivot]], z[[row, pivot]] = x[[pivot, row]], z[[pivot, row]]
+
+        others = x[:, column].copy()
+        others[row] = False
+        x[others] ^= x[row]
+        z[others] ^= z[row]
+
+        pivots.append(column)
+        row += 1
+
+    return pivots, list(range(row, nRows))
+
+
+def _SynthesizeGates(x, z) -> list:
+    '''
+    diagonalizing gates for independent, commuting generators (boolean (k, nQ) arrays, changed in place)
+    '''
+    gates = []
+    noSigns = np.zeros(x.shape[0], dtype=bool)
+
+    def Add(gate):
+        _ApplyGate(gate, x, z, noSigns)
+        gates.append(gate)
+
+    # 1. full X rank
+    pivots, rowsWithoutX = _EchelonX(x, z)
+    while rowsWithoutX:
+        row = rowsWithoutX[0]
+        qubit = next(q for q in np.flatnonzero(z[row]) if q not in pivots)
+        Add(('H', int(qubit)))
+        pivots, rowsWithoutX = _EchelonX(x, z)
+
+    # 2. X block -> identity on the pivots
+    for row, pivot in enumerate(pivots):
+        for target in np.flatnonzero(x[row]):
+            if target != pivot:
+                Add(('CNOT', pivot, int(target)))
+
+    # 3. Z block on the pivots -> identity
+    for row, pivot in enumerate(pivots):
+        if not z[row, pivot]:
+            Add(('S', pivot))
+    for row, pivot in enumerate(pivots):
+        for other in range(row + 1, len(pivots)):
+            if z[row, pivots[other]]:
+                Add(('CZ', pivot, pivots[other]))
+
+    # 4. Z on the other qubits: column p_i of Z is e_i now, CNOT(t, p_i) adds it to column t
+    pivotSet = set(pivots)
+    for row, pivot in enumerate(pivots):
+        for target in np.flatnonzero(z[row]):
+            if target not in pivotSet:
+                Add(('CNOT', int(target), pivot))
+
+    # 5. Y -> X -> Z
+    for pivot in pivots:
+        Add(('S', pivot))
+        Add(('H', pivot))
+
+    return gates
+
+
+class MeasurementCircuit:
+    '''
+    Attributes:
+        nQ:         number of qubits
+        gates:      list of gates of U
+        labels:     members of the family
+        zBits:      boolean (members, nQ), U P U^dagger = sign Z^z for every member
+        signs:      +1 / -1 for every member
+    '''
+
+    def __init__(self, family: list, gates: list):
+        table = PauliTable(family)
+        self.nQ = table.nQ
+        self.gates = [tuple(gate) for gate in gates]
+        self.labels = list(family)
+
+        x, z, signs = ApplyClifford(self.gates, UnpackBits(table.xBits, self.nQ), UnpackBits(table.zBits, self.nQ))
+        if x.any():
+            raise ValueError('the circuit does not diagonalize the family, are all members commuting?')
+
+        self.zBits = z
+        self.signs = 1 - 2*signs.astype(np.int64)
+
+
+    def GateCounts(self) -> dict:
+        counts = {'H': 0, 'S': 0, 'CNOT': 0, 'CZ': 0}
+        for gate in self.gates:
+            counts[gate[0]] += 1
+        return counts
+
+
+    @property
+    def twoQubitGates(self) -> int:
+        return sum(1 for gate in self.gates if gate[0] in TWO_QUBIT_GATES)
+
+
+    def ApplyToState(self, state):
+        '''
+        U |state> for a statevector (basis order as PauliStringToMatrix, qubit q = axis q of the (2, ..., 2) tensor), O(2^n) per gate
+        '''
+        state = np.array(state, dtype=np.complex128).reshape((2,)*self.nQ)
+
+        def Slice(*fixed):
+            index = [slice(None)]*self.nQ
+            for qubit, value in fixed:
+                index[qubit] = value
+            return tuple(index)
+
+        for gate in self.gates:
+            name = gate[0]
+            if name == 'H':
+                zero, one = state[Slice((gate[1], 0))].copy(), state[Slice((gate[1], 1))].copy()
+                state[Slice((gate[1], 0))] = (zero + one) / np.sqrt(2)
+                state[Slice((gate[1], 1))] = (zero - one) / np.sqrt(2)
+            elif name == 'S':
+                state[Slice((gate[1], 1))] *= 1j
+            elif name == 'CZ':
+                state[Slice((gate[1], 1), (gate[2], 1))] *= -1
+            else:
+                control, target = gate[1], gate[2]
+                zero, one = state[Slice((control, 1), (target, 0))].copy(), state[Slice((control, 1), (target, 1))].copy()
+                state[Slice((control, 1), (target, 0))] = one
+                state[Slice((control, 1), (target, 1))] = zero
+
+        return state.reshape(-1)
+
+
+    def MemberValues(self, outcomes):
+        '''
+        +1 / -1 value of every member for measured basis states (indices as in a statevector, first qubit = most significant bit)
+
+        Returns:
+            int array (len(outcomes), members)
+        '''
+        outcomes = np.asarray(outcomes, dtype=np.int64)
+        bits = (outcomes[:, None] >> np.arange(self.nQ - 1, -1, -1)) & 1
+
+        parities = (bits @ self.zBits.T.astype(np.int64)) & 1
+        return self.signs[None, :] * (1 - 2*parities)
+
+
+def DiagonalizingCircuit(family: list) -> MeasurementCircuit:
+    '''
+    measurement circuit of a family of commuting Pauli strings (e.g. from find_max_clique)
+    '''
+    table = PauliTable(family)
+    independent, _ = IndependentSubset(SymplecticVectors(table))
+
+    x = UnpackBits(table.xBits[independent], table.nQ)
+    z = UnpackBits(table.zBits[independent], table.nQ)
+
+    return MeasurementCircuit(family, _SynthesizeGates(x, z))
+
+
+class CircuitCache:
+    '''
+    Cache of the gate lists, keyed by a hash of the (sorted, packed) family. Kept in memory, and as .json files if a directory is given.
+
+    Attributes:
+        directory:      folder of the .json files, or None
+        hits, misses:   statistics of this cache object
+    '''
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._gates = {}
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+
+    def Key(self, family: list) -> str:
+        table = PauliTable(family)
+        uniqueKeys, _ = CanonicalOrder(table)
+
+        hasher = hashlib.sha256()
+        hasher.update(('circuit:' + str(table.nQ) + ':').encode('ascii'))
+        hasher.update(uniqueKeys.tobytes())
+        return hasher.hexdigest()
+
+
+    def _Path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+
+    def _Load(self, key: str):
+        if key in self._gates:
+            return self._gates[key]
+        if self.directory is None:
+            return None
+
+        try:
+            with open(self._Path(key), 'r') as file:
+                gates = [tuple(gate) for gate in json.load(file)]
+        except (FileNotFoundError, OSError, ValueError):
+            return None
+
+        self._gates[key] = gates
+        return gates
+
+
+    def _Store(self, key: str, gates: list):
+        self._gates[key] = gates
+        if self.directory is None:
+            return
+
+        # write to a temporary file first, so other processes never read half written entries
+        fileDescriptor, temporaryPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fileDescriptor, 'w') as file:
+            json.dump([list(gate) for gate in gates], file)
+        os.replace(temporaryPath, self._Path(key))
+
+
+    def GetOrSynthesize(self, family: list) -> MeasurementCircuit:
+        key = self.Key(family)
+        gates = self._Load(key)
+
+        if gates is not None:
+            self.hits += 1
+            return MeasurementCircuit(family, gates)
+
+        self.misses += 1
+        # synthesized for the sorted family, so the circuit does not depend on the order of the members
+        circuit = DiagonalizingCircuit(sorted(family))
+        self._Store(key, circuit.gates)
+
+        return MeasurementCircuit(family, circuit.gates)
+
+
+def CompileFamilies(families: list, cache: CircuitCache = None) -> list:
+    '''
+    measurement circuits of all families, cached if a CircuitCache is given
+    '''
+    if cache is None:
+        return [DiagonalizingCircuit(family) for family in families]
+
+    return [cache.GetOrSynthesize(family) for family in families]
+
+
+def TwoQubitGateReport(circuits: list) -> dict:
+    '''
+    two qubit gates per family and in total, to compare e.g. QWC (no two qubit gates) and GC (fewer, but deeper families)
+    '''
+    perFamily = np.array([circuit.twoQubitGates for circuit in circuits], dtype=np.int64)
+
+    return {
+        'families': len(circuits),
+        'perFamily': perFamily,
+        'total': int(perFamily.sum()),
+        'max': int(perFamily.max()) if len(circuits) > 0 else 0,
+        'mean': float(perFamily.mean()) if len(circuits) > 0 else 0.,
+    }
@@ -2,6 +2,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 import networkx as nx
 import time
+from PauliTable import PauliTable
+from CommutationMatrix import BuildAdjacencyParallel, BuildGraphParallel
+from GF2Algebra import FindDependentStrings
+from CliquePadding import PaddingStrings
+from PauliOperator import PauliStringToSparse
 
 '''
 This file contains all the functions that are needed in order to determine different commutation graphs given Pauli strings and their minimal amount of commuting families. 
@@ -31,43 +36,17 @@ def check_Paulistring(paulistrings):
 
 def PauliStringToMatrix(pauliString: str):
     '''
-    this function turns a pauli string into a matrix 
-    '''
-
-    firstPauli = pauliString[0]
-    restOfPaulis = pauliString[1:]
-
-    X = np.array([[0,1], [1,0]])
-    Y = np.array([[0, -1j], [1j, 0]])
-    Z = np.array([[1, 0], [0, -1]])
+    this function turns a pauli string into a (dense) matrix 
 
-    if firstPauli == 'X': 
-        pauliMatrix = X
-    elif firstPauli == 'Y':
-        pauliMatrix = Y
-    elif firstPauli == 'Z':
-        pauliMatrix = Z
-    else: 
-        pauliMatrix = np.eye(2)
-
-    
-    for pauli in restOfPaulis: 
-        if pauli == 'X': 
-            pauliMatrix = np.kron(pauliMatrix, X)
-        elif pauli == 'Y':
-            pauliMatrix = np.kron(pauliMatrix, Y)
-        elif pauli == 'Z':
-            pauliMatrix = np.kron(pauliMatrix, Z)
-        else: 
-            pauliMatrix = np.kron(pauliMatrix, np.eye(2))
-
-    print(pauliString)
-    print(np.shape(pauliMatrix))
+    The matrix is the same as np.kron(P_0, np.kron(P_1, ...)), but it is built from the permutation + phase form in PauliOperator.py. 
+    For more than a few qubits, use PauliStringToSparse or PauliOperator(pauliString).Apply(state) instead. 
+    '''
+    pauliMatrix = PauliStringToSparse(pauliString).toarray()
 
     return pauliMatrix
 
 
-def checkLinearIndependency(clique: list[str]):
+def checkLinearIndependency(clique: list[str], multiplicative: bool = False):
     '''
     check if, in a given cliques, all elements are linearly independent to all others. 
 
@@ -75,36 +54,15 @@ def checkLinearIndependency(clique: list[str]):
     
                 alpha p_1 + beta p_2 + ... = 0   iff   alpha, beta, ... = 0
 
-    
-    '''
-    cliqueMatrices = [PauliStringToMatrix(pauliString= pauliString) for pauliString in clique]
-
-
-    # turn these into a new system to apply the linalg solve thing 
-
-    vectorList = [matrix.flatten(order='F') for matrix in cliqueMatrices]
+    Different Pauli strings are orthogonal (tr(p_1 p_2) = 0), so this is the case iff no string appears twice. 
+    With multiplicative = True, it is checked that no string is a product of the others, using Gaussian elimination over GF(2) 
+    on the symplectic vectors (see GF2Algebra.py). No 2^n x 2^n matrices are built. 
 
-    newMatrix = np.column_stack((vectorList))
-
-    # # newMatrix = newMatrix.reshape((2,4))
-
-    # print('new Matrix', newMatrix, np.shape(newMatrix))
-
-    matrixOfInterest = np.hstack(cliqueMatrices) 
-
-    rank = np.linalg.matrix_rank(newMatrix)
-
-    isIndep: bool = rank == len(cliqueMatrices)
+    Use FindDependentStrings to get the strings that break the independence. 
+    '''
+    isIndep: bool = len(FindDependentStrings(clique, multiplicative=multiplicative)) == 0
 
     return isIndep
-    zeroMatrix = np.zeros(len(cliqueMatrices))
-    print(zeroMatrix)
-
-    zeroMatrix = zeroMatrix.transpose()
-
-    result = np.linalg.lstsq(np.array(newMatrix), zeroMatrix)
-
-    return result 
 
 
 
@@ -177,66 +135,95 @@ Create Graphs
 '''
 
 # create the Graph given all the different Pauli strings
-def create_Graph_QWC(paulistrings):
+def create_Graph_QWC(paulistrings, nWorkers = None, adjacencyFile = None, asGraph = False):
     '''
-    returns Graph, gets List of Paulistrings as input
+    returns Graph, gets List of Paulistrings (or a PauliTable) as input
+    if nWorkers is given, the commutation matrix is computed in tiles by nWorkers processes and stored bit packed in adjacencyFile (.npy,
+    default: a temporary file the caller removes). Then the packed memory map is returned instead of a graph, it can be passed to
+    PartitionFamilies(..., labels = list(paulistrings)). asGraph = True builds the networkx graph from it and removes the temporary file,
+    networkx needs a few hundred bytes per edge, far more than the packed matrix
     '''
-    # Copy of this Paulistring list 
-    paulistrings_updatet = paulistrings.copy()
+    # pack the strings into bit masks once, the commutation checks are then done on the masks
+    table = paulistrings if isinstance(paulistrings, PauliTable) else PauliTable(paulistrings)
+
+    if nWorkers is not None and not asGraph:
+        return BuildAdjacencyParallel(table, 'QWC', adjacencyFile, nWorkers)
+    if nWorkers is not None:
+        return BuildGraphParallel(table, 'QWC', nWorkers, adjacencyFile)[0]
 
     # create Graph
     Pauli_Graph = nx.Graph()
 
-    for string in paulistrings:
+    # decode the strings once, not in the loop over pairs
+    labels = list(table)
+
+    for i in range(len(table)):
+        string = labels[i]
 
         # add every Pauli string as a node to the graph
         Pauli_Graph.add_node(string)
-        for other_string in paulistrings_updatet:
+
+        # To avoid double counting, only compare to the strings that come after this one
+        otherIndices = np.arange(i+1, len(table))
+        commuting = table.AnticommutingCounts(i, otherIndices) == 0
+
+        for j in otherIndices[commuting]:
+            other_string = labels[j]
 
             # Paulistring always commutes with itself. 
             if other_string == string: 
                 continue
 
             # If two of the paulistrings commute, connect them
-            if QWC_commutes(string, other_string):
-                Pauli_Graph.add_edge(string, other_string)
-
-        # To avoid double counting
-        paulistrings_updatet.remove(string)    # (Wenn wir fuer einen string alle possibilities durchhaben, muessen wir den fuer die weiteren connections nicht beachten)
-
+            Pauli_Graph.add_edge(string, other_string)
 
     return Pauli_Graph
 
 
-def create_Graph_GC(paulistrings, without_QWC = False):
+def create_Graph_GC(paulistrings, without_QWC = False, nWorkers = None, adjacencyFile = None, asGraph = False):
     '''
-    returns Graph, gets List of Paulistrings as input
+    returns Graph, gets List of Paulistrings (or a PauliTable) as input
+    if nWorkers is given, the commutation matrix is computed in tiles by nWorkers processes and stored bit packed in adjacencyFile (.npy,
+    default: a temporary file the caller removes). Then the packed memory map is returned instead of a graph, it can be passed to
+    PartitionFamilies(..., labels = list(paulistrings)). asGraph = True builds the networkx graph from it and removes the temporary file,
+    networkx needs a few hundred bytes per edge, far more than the packed matrix
     '''
-    # Copy of this Paulistring list 
-    paulistrings_updatet = paulistrings.copy()
+    table = paulistrings if isinstance(paulistrings, PauliTable) else PauliTable(paulistrings)
+
+    if nWorkers is not None and not asGraph:
+        return BuildAdjacencyParallel(table, 'without_QWC' if without_QWC else 'GC', adjacencyFile, nWorkers)
+    if nWorkers is not None:
+        return BuildGraphParallel(table, 'without_QWC' if without_QWC else 'GC', nWorkers, adjacencyFile)
 
     # create Graph
     Pauli_Graph = nx.Graph()
 
-    # To color the different edges differently, dep on the commutation type
-    edge_colors = []
+    # decode the strings once, not in the loop over pairs
+    labels = list(table)
 
-    for string in paulistrings:
+    for i in range(len(table)):
+        string = labels[i]
         Pauli_Graph.add_node(string)
-        for other_string in paulistrings_updatet:
+
+        otherIndices = np.arange(i+1, len(table))
+        nonCommutingCounts = table.AnticommutingCounts(i, otherIndices)
+
+        # if the number of non commuting positions is even, the strings GC commute. For GC but not QWC, it should not be zero
+        commuting = nonCommutingCounts % 2 == 0
+        if without_QWC:
+            commuting &= nonCommutingCounts != 0
+
+        for j, nonCommutingCount in zip(otherIndices[commuting], nonCommutingCounts[commuting]):
+            other_string = labels[j]
             if other_string == string: 
                 continue
-            elif GC_commutes(string, other_string, without_QWC):
-                Pauli_Graph.add_edge(string, other_string)
-
-                # If QWC, paint the edge green
-                if QWC_commutes(string, other_string):
-                    edge_colors.append('blue')
-                # If only GC, paint the edge red 
-                elif not QWC_commutes(string, other_string):
-                    edge_colors.append('red')
-                    
-        paulistrings_updatet.remove(string)    # (Wenn wir fuer einen string alle possibilities durchhaben, muessen wir den fuer die weiteren connections nicht beachten)
+
+            # To color the different edges differently, dep on the commutation type
+            # If QWC, paint the edge blue. If only GC, paint the edge red 
+            Pauli_Graph.add_edge(string, other_string, color = 'blue' if nonCommutingCount == 0 else 'red')
+
+    # networkx draws the edges in the order of graph.edges, which is not the order in which they were added
+    edge_colors = [color for _, _, color in Pauli_Graph.edges(data = 'color')]
 
     return Pauli_Graph, edge_colors
 
@@ -245,9 +232,11 @@ def create_Graph_GC(paulistrings, without_QWC = False):
 Draw Graph
 '''
 
-def draw_Graph(graph, title, edge_colors):
+def draw_Graph(graph, title, edge_colors, path = None):
     '''
     Simply displays Graph with title using Matplotlib 
+    If a path is given, the figure is saved there instead of shown (for batch jobs). 
+    For thousands of strings, use RenderAdjacency from RenderAdjacency.py instead
     '''
     fig, ax = plt.subplots(figsize=(8,6))
 
@@ -265,7 +254,12 @@ def draw_Graph(graph, title, edge_colors):
         nx.draw_shell(graph, with_labels = True, **draw_options)
 
     plt.title(title)
-    plt.show()
+
+    if path is not None:
+        fig.savefig(path)
+        plt.close(fig)
+    else:
+        plt.show()
 
 
 
@@ -354,36 +348,10 @@ def PadClique(clique: list, QWC: bool = False) -> list:
     '''
     If a clique is shorter than nQ, pad it with trivial Pauli strings 
 
-    The challenge is to find trivial Pauli strings. Trivial means having as many ones as possible in the Pauli string  
+    The challenge is to find trivial Pauli strings. Trivial means having as many ones as possible in the Pauli string. 
+    They are searched in weight order for any number of qubits, see CliquePadding.py
     '''
-    nQ = len(clique[0])
-
-    noStringsToBeAdded = nQ - len(clique)
-
-    # list of trivial strings. IIII as first element since it is the most trivial 
-    trivialStrings = ['IIII', 'XIII', 'IXII', 'IIXI', 'IIIX', 'YIII', 'IYII', 'IIYI', 'IIIY', 'ZIII', 'IZII', 'IIZI', 'IIIZ']
-
-
-    for trivialString in trivialStrings: 
-        if trivialString in clique: 
-            continue
-        for pauliString in range(len(clique)): 
-            if not QWC and not GC_commutes(trivialString, pauliString): 
-
-                # if trivialstring does not commute with at least one of the paulistrings in the clique, break
-                break
-
-            elif QWC and not QWC_commutes(trivialString, pauliString): 
-
-                # if trivialstring does not commute with at least one of the paulistrings in the clique, break
-                break
-
-        clique.append(trivialString)
-        noStringsToBeAdded -= 1
-
-        if noStringsToBeAdded == 0: 
-            break 
-
+    clique.extend(PaddingStrings(clique, QWC = QWC))
 
     return clique 
 
@@ -392,9 +360,6 @@ def PadClique(clique: list, QWC: bool = False) -> list:
 
 
 
-
-
-
 def SummedWeight(clique: list, weigths: dict): 
     '''
     get the summed weight of all paulistrings in a clique 
@@ -0,0 +1,98 @@
+import numpy as np
+from CommutationMatrix import BuildAdjacency
+
+'''
+This file contains a post processing step for the families of find_max_clique / PartitionFamilies.
+
+Many strings commute with all members of several families, but are only measured in one of them. Here, every string is added to every
+family it fits in, and its shots are split over these families: the estimate of <P_t> is the shot weighted average over the families
+that measure it, so the energy is
+
+                E = sum_f  sum_{t in f}  fraction_{t, f} w_t <P_t>_f,        sum_f fraction_{t, f} = 1
+
+The adjacency rows are bit packed (as BuildAdjacency(..., packed = True)). The strings that fit into a family are the AND of the rows of its
+members (with their own bit set). Every added string ANDs its row into this mask as well, so the extended family is still a clique.
+A family costs (members + added strings) * n/8 bytes of AND operations.
+'''
+
+
+def _PackedAdjacency(adjacency, nTerms: int):
+    adjacency = np.asarray(adjacency)
+    if adjacency.dtype == bool:
+        return np.packbits(adjacency, axis=1, bitorder='little')
+    if adjacency.shape[1] != -(-nTerms // 8):
+        raise ValueError('the adjacency has to be a boolean (n, n) matrix or bit packed rows from BuildAdjacency(..., packed = True)')
+    return adjacency
+
+
+def OverlappingFamilies(families: list, labels: list, adjacency = None, mode: str = 'GC', familyShots = None):
+    '''
+    Accepts:
+        families:       list of families (lists of strings)
+        labels:         all strings, in the order of the rows of the adjacency (or a PauliTable)
+        adjacency:      boolean or bit packed adjacency matrix. If None, it is computed with BuildAdjacency(labels, mode, packed = True)
+        mode:           commutation mode of the adjacency, only used if it has to be computed
+        familyShots:    shots per family (e.g. from AllocateShots). The shots of a string are split proportional to them, otherwise evenly
+
+    Returns:
+        familyTerms:    list of lists of strings, every family with all strings that fit into it
+        termFractions:  dict {string: {family index: fraction of its estimate that comes from this family}}
+    '''
+    nTerms = len(labels)
+
+    if adjacency is None:
+        adjacency = BuildAdjacency(labels, mode, packed=True)
+    packedAdjacency = _PackedAdjacency(adjacency, nTerms)
+
+    labels = list(labels)
+    indexOf = {label: index for index, label in enumerate(labels)}
+
+    familyTerms = []
+    familiesOfTerm = [[] for _ in range(nTerms)]
+
+    for f, family in enumerate(families):
+        members = [indexOf[label] for label in family]
+        if len(members) == 0:
+            familyTerms.append([])
+            continue
+
+        # every string fits with itself, so the own bits of the members are set
+        memberBits = np.zeros(packedAdjacency.shape[1], dtype=np.uint8)
+        for index in members:
+            memberBits[index >> 3] |= np.uint8(1 << (index & 7))
+        fits = np.bitwise_and.reduce(packedAdjacency[members], axis=0) | memberBits
+
+        # the added strings also have to commute with each other, so the family stays measurable at once.
+        # They are added one after the other (lowest index first), each one removes the strings it does not commute with
+        terms = list(members)
+        available = fits & ~memberBits
+        while available.any():
+            byte = int(np.flatnonzero(available)[0])
+            value = int(available[byte])
+            candidate = 8*byte + (value & -value).bit_length() - 1
+
+            terms.append(candidate)
+            fits &= packedAdjacency[candidate]
+            memberBits[byte] |= np.uint8(value & -value)
+            fits |= memberBits
+            available = fits & ~memberBits
+
+        familyTerms.append([labels[index] for index in terms])
+
+        for index in terms:
+            familiesOfTerm[index].append(f)
+
+    if familyShots is None:
+        familyShots = np.ones(len(families))
+    familyShots = np.asarray(familyShots, dtype=np.float64)
+
+    termFractions = {}
+    for index, termFamilies in enumerate(familiesOfTerm):
+        if len(termFamilies) == 0:
+            continue
+
+        shots = familyShots[termFamilies]
+        fractions = shots / shots.sum() if shots.sum() > 0 else np.full(len(termFamilies), 1/len(termFamilies))
+        termFractions[labels[index]] = dict(zip(termFamilies, fractions.tolist()))
+
+    return familyTerms, termFractions
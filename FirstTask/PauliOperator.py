@@ -0,0 +1,206 @@
+import numpy as np
+import scipy.sparse as sparse
+from PauliTable import PauliTable, Popcount, UnpackBits
+
+'''
+This file contains Pauli strings as operators on the 2^n dimensional state space, without the np.kron chain of PauliStringToMatrix.
+
+The basis states are ordered as in np.kron(P_0, np.kron(P_1, ...)): the first character of the string acts on the most significant bit
+of the basis index. In this order, the string has the bit masks x and z (integers) and
+
+                P |b> = i^popcount(x & z) (-1)^popcount(z & b) |b ^ x>
+
+So every Pauli string is a permutation (b -> b ^ x) times a diagonal of phases. The matrix has exactly one nonzero per row and column,
+and applying it to a statevector costs O(2^n) without building any matrix.
+
+Products of Pauli strings (MultiplyPaulis) and expectation values of many strings at once (PauliExpectations) work on the masks directly.
+'''
+
+
+def BasisMasks(pauliStrings):
+    '''
+    x and z masks of all strings as int64 arrays, in the basis order described above (first character = most significant bit)
+    '''
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+
+    if table.nQ > 62:
+        raise ValueError('statevectors are only possible for up to 62 qubits, not ' + str(table.nQ))
+
+    bitValues = np.left_shift(np.int64(1), np.arange(table.nQ - 1, -1, -1, dtype=np.int64))
+
+    xMasks = UnpackBits(table.xBits, table.nQ).astype(np.int64) @ bitValues
+    zMasks = UnpackBits(table.zBits, table.nQ).astype(np.int64) @ bitValues
+
+    return xMasks, zMasks
+
+
+def PauliPhases(x: int, z: int, nQ: int):
+    '''
+    diagonal part of the Pauli string: entry b is the prefactor of |b ^ x> in P |b>
+    '''
+    basisStates = np.arange(2**nQ, dtype=np.int64)
+    signs = 1 - 2*(Popcount(basisStates & z) & 1).astype(np.int8)
+
+    return (1j)**(bin(x & z).count('1') % 4) * signs
+
+
+def WalshHadamardTransform(values):
+    '''
+    result[b] = sum_z values[z] (-1)^popcount(z & b), in O(n 2^n)
+    '''
+    result = np.array(values, dtype=np.complex128)
+    dimension = result.shape[0]
+
+    half = 1
+    while half < dimension:
+        blocks = result.reshape(-1, 2, half)
+        upper, lower = blocks[:, 0, :].copy(), blocks[:, 1, :]
+        blocks[:, 0, :] += lower
+        blocks[:, 1, :] = upper - lower
+        half *= 2
+
+    return result
+
+
+class PauliOperator:
+    '''
+    Implicit (permutation + phase) form of a Pauli string.
+
+    Attributes:
+        nQ:     number of qubits
+        x, z:   masks in the basis order (first character = most significant bit)
+    '''
+
+    def __init__(self, pauliString: str = None, x: int = None, z: int = None, nQ: int = None):
+        if pauliString is not None:
+            xMasks, zMasks = BasisMasks([pauliString])
+            x, z, nQ = int(xMasks[0]), int(zMasks[0]), len(pauliString)
+
+        self.x, self.z, self.nQ = x, z, nQ
+        self._phases = None
+
+
+    @property
+    def dimension(self) -> int:
+        return 2**self.nQ
+
+
+    def Phases(self):
+        # the phases are needed by every method below, so they are only computed once
+        if self._phases is None:
+            self._phases = PauliPhases(self.x, self.z, self.nQ)
+        return self._phases
+
+
+    def Apply(self, state):
+        '''
+        returns P |state>. state has shape (2^n,) or (2^n, k) for k states at once
+        '''
+        state = np.asarray(state)
+        phases = self.Phases()
+        if state.ndim == 2:
+            phases = phases[:, None]
+
+        result = np.empty(state.shape, dtype=np.result_type(state, np.complex128))
+        result[np.arange(self.dimension) ^ self.x] = phases*state
+
+        return result
+
+
+    def Expectation(self, state) -> float:
+        '''
+        <state| P |state>, real since P is hermitian
+        '''
+        return np.vdot(state, self.Apply(state)).real
+
+
+    def ToSparse(self, format: str = 'csr'):
+        '''
+        scipy.sparse matrix with exactly 2^n nonzeros
+        '''
+        rows = np.arange(self.dimension, dtype=np.int64)
+        columns = rows ^ self.x
+
+        matrix = sparse.csr_matrix((self.Phases()[columns], columns, np.arange(self.dimension + 1)), shape=(self.dimension, self.dimension))
+
+        return matrix.asformat(format)
+
+
+def PauliStringToSparse(pauliString: str, format: str = 'csr'):
+    '''
+    sparse version of PauliStringToMatrix
+    '''
+    return PauliOperator(pauliString).ToSparse(format)
+
+
+def MultiplyPaulis(x1, z1, x2, z2):
+    '''
+    product of Pauli strings given by their masks (ints or int64 arrays):  P_1 P_2 = i^power P_3
+
+    With P = i^popcount(x & z) X^x Z^z and Z^z1 X^x2 = (-1)^popcount(z1 & x2) X^x2 Z^z1, the power is
+
+                popcount(x1 & z1) + popcount(x2 & z2) + 2 popcount(z1 & x2) - popcount(x3 & z3)   (mod 4)
+
+    Returns:
+        power, x3, z3
+    '''
+    x3, z3 = np.bitwise_xor(x1, x2), np.bitwise_xor(z1, z2)
+
+    power = (Popcount(np.bitwise_and(x1, z1)).astype(np.int64) + Popcount(np.bitwise_and(x2, z2))
+             + 2*Popcount(np.bitwise_and(z1, x2)).astype(np.int64) - Popcount(np.bitwise_and(x3, z3))) % 4
+
+    return power, x3, z3
+
+
+class PauliExpectations:
+    '''
+    Batched <state| P |state> for many Pauli strings (masks in the basis order of BasisMasks).
+
+        <P> = i^popcount(x & z) sum_b (-1)^popcount(z & b) conj(state[b ^ x]) state[b]
+
+    For all strings with the same x, this is one Walsh-Hadamard transform of conj(state[b ^ x]) state[b], read out at the z's.
+    The transforms are kept for the next call (up to maxCached of them), since the same x come up again and again.
+
+    The state is either a statevector, or a computational basis state (int, or bitstring with the first qubit first).
+    For a basis state |b0>, <P> = (-1)^popcount(z & b0) if x == 0 and 0 otherwise, no vectors are needed.
+    '''
+
+    def __init__(self, state, maxCached: int = 64):
+        if isinstance(state, str):
+            state = int(state, 2)
+
+        if isinstance(state, (int, np.integer)):
+            self.basisState, self.state = int(state), None
+        else:
+            self.basisState, self.state = None, np.asarray(state, dtype=np.complex128)
+
+        self.maxCached = maxCached
+        self._transforms = {}
+
+
+    def __call__(self, xMasks, zMasks):
+        xMasks = np.atleast_1d(np.asarray(xMasks, dtype=np.int64))
+        zMasks = np.atleast_1d(np.asarray(zMasks, dtype=np.int64))
+
+        if self.state is None:
+            signs = 1 - 2*(Popcount(zMasks & self.basisState) & 1).astype(np.float64)
+            return np.where(xMasks == 0, signs, 0.)
+
+        values = np.empty(len(xMasks), dtype=np.complex128)
+
+        for x in np.unique(xMasks):
+            group = np.nonzero(xMasks == x)[0]
+            values[group] = self._Transform(int(x))[zMasks[group]]
+
+        return (values * (1j)**(Popcount(xMasks & zMasks) % 4)).real
+
+
+    def _Transform(self, x: int):
+        if x not in self._transforms:
+            if len(self._transforms) >= self.maxCached:
+                self._transforms.clear()
+
+            basisStates = np.arange(len(self.state), dtype=np.int64)
+            self._transforms[x] = WalshHadamardTransform(np.conj(self.state[basisStates ^ x]) * self.state)
+
+        return self._transforms[x]
@@ -0,0 +1,211 @@
+import numpy as np
+
+'''
+This file contains a bit packed (symplectic) representation of a list of Pauli strings.
+
+Every Pauli string on nQ qubits is stored as two bit masks, x and z, where qubit i is bit i of the masks:
+
+                1 -> (x=0, z=0),   X -> (1, 0),   Z -> (0, 1),   Y -> (1, 1)
+
+The masks are split up in uint64 words, so a table of nTerms strings is stored in two arrays of shape (nTerms, nWords).
+
+Two single qubit Paulis anticommute iff x1 z2 + z1 x2 = 1. So the number of positions where two strings do not commute is simply
+
+                popcount( (x1 & z2) ^ (z1 & x2) )
+
+which replaces the character by character loop of QWC_commutes and GC_commutes.
+'''
+
+# the old files use '1' for the identity, PadClique uses 'I'. Both are accepted
+IDENTITY_CHARACTERS = '1I'
+
+# lookup table for the popcount fallback, numpy < 2.0 has no np.bitwise_count
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def Popcount(words):
+    '''
+    returns the number of set bits in every element of an unsigned integer array
+    '''
+    words = np.asarray(words)
+
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+
+    bytesView = np.ascontiguousarray(words).view(np.uint8).reshape(words.shape + (-1,))
+    return _BYTE_POPCOUNT[bytesView].sum(axis=-1)
+
+
+def PackBits(bits):
+    '''
+    turns a boolean array of shape (nTerms, nQ) into uint64 words of shape (nTerms, nWords), qubit i is bit i
+    '''
+    bits = np.asarray(bits, dtype=bool)
+    nTerms, nQ = bits.shape
+    nWords = max(1, -(-nQ // 64))
+
+    padded = np.zeros((nTerms, 64*nWords), dtype=bool)
+    padded[:, :nQ] = bits
+
+    # explicitly little endian, so that the bit order does not depend on the machine
+    return np.packbits(padded, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+
+def UnpackBits(words, nQ: int):
+    '''
+    inverse of PackBits, returns a boolean array of shape (nTerms, nQ)
+    '''
+    words = np.ascontiguousarray(np.asarray(words).astype('<u8'))
+    return np.unpackbits(words.view(np.uint8), axis=1, bitorder='little')[:, :nQ].astype(bool)
+
+
+def PackPauliStrings(pauliStrings):
+    '''
+    Accepts:
+        pauliStrings:   list of strings of equal length containing '1' (or 'I'), 'X', 'Y' and 'Z'
+
+    Returns:
+        xBits, zBits:   uint64 arrays of shape (nTerms, nWords)
+        nQ:             number of qubits
+    '''
+    nTerms = len(pauliStrings)
+    if nTerms == 0:
+        raise ValueError('cannot pack an empty list of Pauli strings')
+
+    nQ = len(pauliStrings[0])
+
+    characters = np.frombuffer(''.join(pauliStrings).encode('ascii'), dtype=np.uint8)
+    if characters.size != nTerms*nQ or any(len(pauliString) != nQ for pauliString in pauliStrings):
+        raise ValueError('all Pauli strings have to be of the same size')
+    characters = characters.reshape(nTerms, nQ)
+
+    isX = characters == ord('X')
+    isY = characters == ord('Y')
+    isZ = characters == ord('Z')
+
+    isIdentity = np.zeros_like(isX)
+    for character in IDENTITY_CHARACTERS:
+        isIdentity |= characters == ord(character)
+
+    if not np.all(isX | isY | isZ | isIdentity):
+        invalidTerm = int(np.nonzero(~np.all(isX | isY | isZ | isIdentity, axis=1))[0][0])
+        raise ValueError('The ' + str(invalidTerm) + 'th Paulistring contains characters other than 1, I, X, Y, Z')
+
+    return PackBits(isX | isY), PackBits(isZ | isY), nQ
+
+
+class PauliTable:
+    '''
+    A list of Pauli strings, stored as X and Z bit masks.
+
+    Can be used everywhere a list of Pauli strings is expected that is only indexed, iterated over or measured with len().
+    Indexing returns the string itself, the commutation checks work with the indices of the strings in the table.
+
+    Attributes:
+        xBits, zBits:   uint64 arrays of shape (nTerms, nWords)
+        nQ:             number of qubits
+        labels:         the original strings, or None if the table was built from masks. Then the strings are created on demand
+    '''
+
+    def __init__(self, pauliStrings):
+        self.labels = list(pauliStrings)
+        self.xBits, self.zBits, self.nQ = PackPauliStrings(self.labels)
+
+
+    @classmethod
+    def FromMasks(cls, xBits, zBits, nQ: int, labels = None):
+        '''
+        build a table directly from packed masks, without going through strings
+        '''
+        table = cls.__new__(cls)
+        table.xBits = np.ascontiguousarray(xBits, dtype=np.uint64)
+        table.zBits = np.ascontiguousarray(zBits, dtype=np.uint64)
+        table.nQ = nQ
+        table.labels = None if labels is None else list(labels)
+        return table
+
+
+    def __len__(self):
+        return self.xBits.shape[0]
+
+
+    def __getitem__(self, index):
+        if self.labels is not None:
+            return self.labels[index]
+        return self.ToStrings(np.array([index]))[0]
+
+
+    def __iter__(self):
+        if self.labels is not None:
+            return iter(self.labels)
+        return iter(self.ToStrings())
+
+
+    def ToStrings(self, indices = None) -> list:
+        '''
+        returns the Pauli strings with '1' as identity, created from the masks
+        '''
+        if indices is None:
+            indices = slice(None)
+
+        x = UnpackBits(self.xBits[indices], self.nQ)
+        z = UnpackBits(self.zBits[indices], self.nQ)
+
+        characterCodes = np.frombuffer(b'1XZY', dtype=np.uint8)[x.astype(np.uint8) + 2*z.astype(np.uint8)]
+
+        return [row.tobytes().decode('ascii') for row in characterCodes]
+
+
+    def Subset(self, indices):
+        '''
+        returns a new table that only contains the terms with the given indices
+        '''
+        indices = np.asarray(indices, dtype=np.intp)
+        labels = None if self.labels is None else [self.labels[i] for i in indices]
+        return PauliTable.FromMasks(self.xBits[indices], self.zBits[indices], self.nQ, labels)
+
+
+    def ToIntegers(self, indices = None):
+        '''
+        returns the x and z masks as lists of python ints (qubit i is bit i), for bit tricks on arbitrary many qubits
+        '''
+        if indices is None:
+            indices = slice(None)
+
+        xInts = [int.from_bytes(row.astype('<u8').tobytes(), 'little') for row in self.xBits[indices]]
+        zInts = [int.from_bytes(row.astype('<u8').tobytes(), 'little') for row in self.zBits[indices]]
+
+        return xInts, zInts
+
+
+    def AnticommutingCounts(self, index: int, otherIndices = None):
+        '''
+        number of positions in which the string at index does not commute with each of the strings at otherIndices (default: all strings)
+        '''
+        if otherIndices is None:
+            otherIndices = slice(None)
+
+        x, z = self.xBits[index], self.zBits[index]
+        anticommuting = (x & self.zBits[otherIndices]) ^ (z & self.xBits[otherIndices])
+
+        return Popcount(anticommuting).sum(axis=-1, dtype=np.int64)
+
+
+    def QWC_commutes(self, index1: int, index2: int) -> bool:
+        '''
+        same as QWC_commutes in Methods.py, but for two indices of the table
+        '''
+        return self.AnticommutingCounts(index1, index2) == 0
+
+
+    def GC_commutes(self, index1: int, index2: int, without_QWC: bool = False) -> bool:
+        '''
+        same as GC_commutes in Methods.py, but for two indices of the table
+        '''
+        nonCommutingCount = self.AnticommutingCounts(index1, index2)
+
+        # for GC but not QWC, choose also that non_commuting_count should not be zero
+        if without_QWC and nonCommutingCount == 0:
+            return False
+
+        return nonCommutingCount % 2 == 0
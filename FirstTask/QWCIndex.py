@@ -0,0 +1,128 @@
+import numpy as np
+from PauliTable import PauliTable, UnpackBits
+
+'''
+This file contains a QWC grouping that finds a compatible family by a lookup instead of a scan over all families.
+
+QWC compatibility only depends on the single qubit Paulis: a string fits into a family if, on every qubit the string acts on,
+the family is either free (no member acts on it) or measures the same Pauli. So every family is its merged basis, e.g. 'XZ-Y' (- = free).
+
+The index keeps, for every qubit q and Pauli p, the bitset (python int) of the families that are fixed to a different Pauli on q:
+
+                blocked[q][p] = { f : basis_f[q] not in (free, p) }
+
+The families a string fits into are the ones not blocked on any qubit of its support, i.e. ~(OR of blocked[q][p_q]).
+The first compatible family is the lowest set bit. A string on k qubits costs k ORs of bitsets, independent of the number of strings.
+'''
+
+# index of the single qubit Paulis: x + 2 z
+_PAULI_CHARACTERS = '-XZY'
+
+
+class QWCIndex:
+    '''
+    Attributes:
+        nQ:         number of qubits
+        families:   list of families (lists of the labels given to Add)
+        bases:      merged basis of every family as bytearray (0 = free, 1 = X, 2 = Z, 3 = Y per qubit)
+    '''
+
+    def __init__(self, nQ: int):
+        self.nQ = nQ
+        self.families = []
+        self.bases = []
+        self.blocked = [[0, 0, 0, 0] for _ in range(nQ)]
+
+
+    def FirstCompatible(self, qubits, paulis) -> int:
+        '''
+        first family that fits the string acting with paulis (1 = X, 2 = Z, 3 = Y) on qubits, -1 if there is none
+        '''
+        blocked = 0
+        for qubit, pauli in zip(qubits, paulis):
+            blocked |= self.blocked[qubit][pauli]
+
+        compatible = ~blocked & ((1 << len(self.families)) - 1)
+        if compatible == 0:
+            return -1
+
+        return (compatible & -compatible).bit_length() - 1
+
+
+    def Add(self, label, qubits, paulis) -> int:
+        '''
+        adds the string to the first compatible family (or a new one) and updates the index, returns the family.
+        label is what is stored in families, e.g. the string or its index in a PauliTable
+        '''
+        family = self.FirstCompatible(qubits, paulis)
+        if family == -1:
+            family = len(self.families)
+            self.families.append([])
+            self.bases.append(bytearray(self.nQ))
+
+        basis = self.bases[family]
+        familyBit = 1 << family
+
+        for qubit, pauli in zip(qubits, paulis):
+            if basis[qubit] == 0:
+                # the qubit is fixed now, the family is blocked for the two other Paulis on it
+                basis[qubit] = pauli
+                for other in (1, 2, 3):
+                    if other != pauli:
+                        self.blocked[qubit][other] |= familyBit
+
+        self.families[family].append(label)
+        return family
+
+
+    def MergedBasis(self, family: int) -> str:
+        return ''.join(_PAULI_CHARACTERS[pauli] for pauli in self.bases[family])
+
+
+def _Supports(table: PauliTable, order, chunkSize: int = 2**14):
+    '''
+    generator of (index, qubits, paulis) for the strings in order: the qubits a string acts on and its Paulis there (1 = X, 2 = Z, 3 = Y)
+    '''
+    for start in range(0, len(order), chunkSize):
+        chunk = np.asarray(order[start:start + chunkSize], dtype=np.int64)
+
+        paulis = UnpackBits(table.xBits[chunk], table.nQ) + 2*UnpackBits(table.zBits[chunk], table.nQ)
+        rows, qubits = np.nonzero(paulis)
+        # support of every string of the chunk, as slices of rows / qubits
+        bounds = np.searchsorted(rows, np.arange(len(chunk) + 1))
+        qubits, paulis = qubits.tolist(), paulis[rows, qubits].tolist()
+
+        for position, index in enumerate(chunk.tolist()):
+            first, last = bounds[position], bounds[position + 1]
+            yield index, qubits[first:last], paulis[first:last]
+
+
+def QWCFamilies(pauliStrings, weights = None, chunkSize: int = 2**14) -> list:
+    '''
+    Accepts:
+        pauliStrings:   list of Pauli strings or PauliTable
+        weights:        optional dict {paulistring: weight} or array. If given, the strings with the largest |weight| are placed first
+        chunkSize:      number of strings unpacked to single qubit Paulis at once
+
+    Returns:
+        list of families (lists of strings), the format of find_max_clique. Repeated strings are only placed once
+    '''
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    labels = list(table)
+
+    if weights is None:
+        order = np.arange(len(table))
+    else:
+        if isinstance(weights, dict):
+            weights = np.array([weights[label] for label in labels])
+        order = np.argsort(-np.abs(weights), kind='stable')
+
+    # first occurrence of every string
+    placed = set()
+    order = [index for index in order if not (labels[index] in placed or placed.add(labels[index]))]
+
+    index = QWCIndex(table.nQ)
+    for term, qubits, paulis in _Supports(table, order, chunkSize):
+        index.Add(labels[term], qubits, paulis)
+
+    return index.families
@@ -0,0 +1,248 @@
+import os
+import time
+import numpy as np
+from multiprocessing import Pool, TimeoutError
+from PauliTable import PauliTable, Popcount
+from GF2Algebra import GF2Basis
+from ImplicitGrouping import IMPLICIT_MODES, MaskRows, AssignFamilies
+
+'''
+This file contains a heuristic grouping for very large Hamiltonians (10^6 strings), where even DSATUR on the full graph is too slow.
+
+Several sorted insertion passes (ImplicitFamilies, no graph) are run in a process pool, every pass with a different order of the strings:
+start 0 is plain sorted insertion (largest |weight| first), the other starts multiply the |weights| by random factors exp(noise N(0, 1)),
+or shuffle the strings if there are no weights. So the result is never worse than sorted insertion.
+
+Every pass is followed by a local repair (RepairFamilies): starting with the smallest family, all members of a family are moved into
+other families they commute with. If that works for every member, the family is dissolved, otherwise it is restored.
+The families are stored as in ImplicitGrouping (merged masks for QWC, a GF(2) basis of the span for GC), so a move is a few
+vectorized checks against these rows, and undoing a failed attempt only truncates the rows and restores the touched families.
+
+The partition with the fewest families is kept. Passes are started until nStarts are done or the time budget is used up,
+the repair of a running pass stops at the deadline.
+'''
+
+
+def _FirstOtherFamily(rows: MaskRows, mode: str, x, z, nFamilies: int, excluded) -> int:
+    '''
+    first family (not excluded) the string fits in, -1 if there is none
+    '''
+    if mode == 'QWC':
+        overlap = (x | z) & (rows.x[:nFamilies] | rows.z[:nFamilies])
+        blocked = (((x ^ rows.x[:nFamilies]) | (z ^ rows.z[:nFamilies])) & overlap).any(axis=1)
+    else:
+        anticommuting = (Popcount((x & rows.z[:rows.nRows]) ^ (z & rows.x[:rows.nRows])).sum(axis=1) & 1).astype(bool)
+        blocked = np.zeros(nFamilies, dtype=bool)
+        blocked[rows.family[:rows.nRows][anticommuting]] = True
+
+    blocked |= excluded
+    family = int(np.argmin(blocked))
+    return -1 if blocked[family] else family
+
+
+def RepairFamilies(table: PauliTable, mode: str, familyOfTerm, deadline: float = None) -> np.ndarray:
+    '''
+    tries to dissolve the families, smallest first, by moving all their members into other families
+
+    Accepts:
+        table:          PauliTable
+        mode:           'QWC' or 'GC'
+        familyOfTerm:   int array, family of every string (-1 for strings that are not placed), e.g. from AssignFamilies
+        deadline:       time.time() at which the repair stops
+
+    Returns:
+        new familyOfTerm, the families are numbered 0, 1, ... again
+    '''
+    familyOfTerm = np.array(familyOfTerm, dtype=np.int64)
+    nFamilies = int(familyOfTerm.max()) + 1 if len(familyOfTerm) > 0 else 0
+
+    placed = np.flatnonzero(familyOfTerm >= 0)
+    placed = placed[np.argsort(familyOfTerm[placed], kind='stable')]
+    members = [list(indices) for indices in np.split(placed, np.searchsorted(familyOfTerm[placed], np.arange(1, nFamilies)))]
+
+    # family f is row f for QWC, for GC every family has one row per basis vector
+    rows = MaskRows(table.xBits.shape[1])
+    spans = []
+    xInts, zInts = table.ToIntegers() if mode == 'GC' else (None, None)
+
+    for family in range(nFamilies):
+        if mode == 'QWC':
+            rows.Append(np.bitwise_or.reduce(table.xBits[members[family]]), np.bitwise_or.reduce(table.zBits[members[family]]), family)
+            continue
+
+        spans.append(GF2Basis())
+        for index in members[family]:
+            if spans[family].Add(xInts[index] | (zInts[index] << table.nQ)):
+                rows.Append(table.xBits[index], table.zBits[index], family)
+
+    dissolved = np.zeros(nFamilies, dtype=bool)
+
+    for family in sorted(range(nFamilies), key=lambda family: len(members[family])):
+        if deadline is not None and time.time() > deadline:
+            break
+
+        excluded = dissolved.copy()
+        excluded[family] = True
+
+        # state of the families that receive members, to undo a failed attempt
+        savedRows = rows.nRows
+        saved = {}
+        moves = []
+
+        for index in members[family]:
+            x, z = table.xBits[index], table.zBits[index]
+            target = _FirstOtherFamily(rows, mode, x, z, nFamilies, excluded)
+            if target == -1:
+                break
+
+            if target not in saved:
+                saved[target] = (rows.x[target].copy(), rows.z[target].copy()) if mode == 'QWC' else dict(spans[target].pivots)
+
+            if mode == 'QWC':
+                rows.x[target] |= x
+                rows.z[target] |= z
+            elif spans[target].Add(xInts[index] | (zInts[index] << table.nQ)):
+                rows.Append(x, z, target)
+
+            moves.append((index, target))
+
+        if len(moves) < len(members[family]):
+            rows.nRows = savedRows
+            for target, state in saved.items():
+                if mode == 'QWC':
+                    rows.x[target], rows.z[target] = state
+                else:
+                    spans[target].pivots = state
+            continue
+
+        # the rows of a dissolved family stay, but they are excluded from now on
+        dissolved[family] = True
+        for index, target in moves:
+            familyOfTerm[index] = target
+            members[target].append(index)
+        members[family] = []
+
+    # renumber the remaining families
+    newNumbers = np.cumsum(~dissolved) - 1
+    familyOfTerm[placed] = newNumbers[familyOfTerm[placed]]
+
+    return familyOfTerm
+
+
+def _RandomOrder(nTerms: int, weights, start: int, noise: float, seed):
+    '''
+    order of the strings for one start. Start 0 is sorted insertion (or the given order without weights)
+    '''
+    if start == 0:
+        return np.arange(nTerms) if weights is None else np.argsort(-np.abs(weights), kind='stable')
+
+    rng = np.random.default_rng([start] if seed is None else [seed, start])
+    if weights is None:
+        return rng.permutation(nTerms)
+
+    return np.argsort(-np.abs(weights) * np.exp(noise * rng.normal(size=nTerms)), kind='stable')
+
+
+# state of a worker process of RandomizedFamilies, set by _InitWorker
+_worker = {}
+
+
+def _InitWorker(xBits, zBits, nQ: int, mode: str, weights, noise: float, seed, deadline: float):
+    _worker['table'] = PauliTable.FromMasks(xBits, zBits, nQ)
+    _worker['mode'] = mode
+    _worker['weights'] = weights
+    _worker['noise'] = noise
+    _worker['seed'] = seed
+    _worker['deadline'] = deadline
+
+
+def _RandomizedPass(start: int):
+    '''
+    one sorted insertion pass with repair. Returns None if the time budget was already used up (except for start 0)
+    '''
+    if start > 0 and time.time() > _worker['deadline']:
+        return None
+
+    table, mode = _worker['table'], _worker['mode']
+    order = _RandomOrder(len(table), _worker['weights'], start, _worker['noise'], _worker['seed'])
+
+    familyOfTerm = AssignFamilies(table, mode, order)
+    return start, RepairFamilies(table, mode, familyOfTerm, _worker['deadline'])
+
+
+def RandomizedFamilies(pauliStrings, mode: str = 'GC', weights = None, timeBudget: float = 60., nWorkers: int = None,
+                       nStarts: int = None, noise: float = 0.3, seed = None) -> list:
+    '''
+    Accepts:
+        pauliStrings:   list of Pauli strings or PauliTable
+        mode:           'QWC' or 'GC'
+        weights:        optional dict {paulistring: weight} or array, the passes place large |weights| first
+        timeBudget:     seconds, no new passes are started afterwards. Start 0 (sorted insertion) is always finished
+        nWorkers:       number of processes, default os.cpu_count(). With 1, everything runs in this process
+        nStarts:        maximal number of passes, default 4 nWorkers
+        noise:          spread of the random factors of the weights
+        seed:           seed of the random orders
+
+    Returns:
+        list of families (lists of strings), the format of find_max_clique, largest family first. Repeated strings are only placed once
+    '''
+    if mode not in IMPLICIT_MODES:
+        raise ValueError('mode has to be one of ' + str(IMPLICIT_MODES) + ', not ' + str(mode))
+
+    deadline = time.time() + timeBudget
+
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    labels = list(table)
+
+    # first occurrence of every string
+    firstIndex = {}
+    for index, label in enumerate(labels):
+        firstIndex.setdefault(label, index)
+    unique = np.array(list(firstIndex.values()), dtype=np.int64)
+    if len(unique) == 0:
+        return []
+
+    if isinstance(weights, dict):
+        weights = np.array([weights[labels[index]] for index in unique])
+    elif weights is not None:
+        weights = np.asarray(weights)[unique]
+
+    if nWorkers is None:
+        nWorkers = os.cpu_count() or 1
+    if nStarts is None:
+        nStarts = 4*nWorkers
+
+    initArguments = (table.xBits[unique], table.zBits[unique], table.nQ, mode, weights, noise, seed, deadline)
+    best = None
+    sortedInsertionDone = False
+
+    def Keep(result):
+        nonlocal best, sortedInsertionDone
+        if result is None:
+            return
+        start, familyOfTerm = result
+        sortedInsertionDone |= start == 0
+        if best is None or familyOfTerm.max() < best.max():
+            best = familyOfTerm
+
+    if nWorkers == 1:
+        _InitWorker(*initArguments)
+        for start in range(nStarts):
+            Keep(_RandomizedPass(start))
+            if time.time() > deadline:
+                break
+    else:
+        with Pool(nWorkers, initializer=_InitWorker, initargs=initArguments) as pool:
+            results = pool.imap_unordered(_RandomizedPass, range(nStarts))
+            while True:
+                # wait for start 0 in any case, afterwards only until the deadline
+                try:
+                    Keep(results.next(None if not sortedInsertionDone else max(0., deadline - time.time())))
+                except (StopIteration, TimeoutError):
+                    break
+
+    families = [[] for _ in range(best.max() + 1)]
+    for index, family in zip(unique, best):
+        families[family].append(labels[index])
+
+    return sorted(families, key=len, reverse=True)
@@ -0,0 +1,119 @@
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PauliTable import PauliTable, Popcount
+from CommutationMatrix import COMMUTATION_MODES
+
+'''
+This file contains a headless drawing of the commutation graph for thousands of strings, instead of draw_Graph (nx.draw_shell + plt.show).
+
+The graph is drawn as its adjacency matrix, with the strings sorted by family, so every family is a filled block on the diagonal.
+Pixel (i, j) shows the fraction of commuting pairs between the strings of row bin i and column bin j. If there are more strings than
+pixels, this fraction is estimated from samplesPerPixel random pairs of the two bins, so the cost is pixels^2 * samplesPerPixel
+and does not depend on the number of strings or edges. With fewer strings than pixels, every pair is computed exactly.
+
+Only a matplotlib Figure with the Agg canvas is used (no pyplot), so nothing is shown and batch jobs do not block.
+The file format (png, svg, pdf, ...) is taken from the file extension.
+'''
+
+
+def _PairsCommute(table: PauliTable, rows, columns, mode: str):
+    '''
+    elementwise version of CommutationBlock: True where string rows[k] commutes with string columns[k]
+    '''
+    anticommuting = (table.xBits[rows] & table.zBits[columns]) ^ (table.zBits[rows] & table.xBits[columns])
+    counts = Popcount(anticommuting).sum(axis=-1)
+
+    if mode == 'QWC':
+        return counts == 0
+    if mode == 'without_QWC':
+        return (counts % 2 == 0) & (counts != 0)
+    return counts % 2 == 0
+
+
+def FamilyOrder(labels: list, families: list = None):
+    '''
+    permutation of the strings such that the members of every family are next to each other, and the family boundaries in it
+    '''
+    if families is None:
+        return np.arange(len(labels)), np.zeros(0, dtype=np.int64)
+
+    indexOf = {label: index for index, label in enumerate(labels)}
+    order = [indexOf[label] for family in families for label in family]
+
+    # strings that are in no family are put at the end
+    inFamily = set(order)
+    order += [index for index in range(len(labels)) if index not in inFamily]
+
+    boundaries = np.cumsum([len(family) for family in families])[:-1]
+    return np.array(order, dtype=np.int64), boundaries
+
+
+def DensityImage(pauliStrings, mode: str = 'GC', families: list = None, pixels: int = 512, samplesPerPixel: int = 16, seed = None):
+    '''
+    Accepts:
+        pauliStrings:       list of Pauli strings or PauliTable
+        mode:               'QWC', 'GC' or 'without_QWC'
+        families:           optional families (e.g. from find_max_clique), the strings are sorted by them
+        pixels:             image size (pixels x pixels), smaller if there are fewer strings
+        samplesPerPixel:    random pairs per pixel if there are more strings than pixels
+
+    Returns:
+        image:              float array (size, size), fraction of commuting pairs per pixel
+        boundaries:         family boundaries, as positions in the sorted strings
+    '''
+    if mode not in COMMUTATION_MODES:
+        raise ValueError('mode has to be one of ' + str(COMMUTATION_MODES) + ', not ' + str(mode))
+
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    nTerms = len(table)
+    order, boundaries = FamilyOrder(list(table), families)
+
+    size = min(pixels, nTerms)
+    # first string of every bin, the bins have (almost) equal size
+    edges = (np.arange(size + 1) * nTerms) // size
+    starts, lengths = edges[:-1], np.diff(edges)
+
+    rng = np.random.default_rng(seed)
+    image = np.zeros((size, size))
+
+    for row in range(size):
+        if size == nTerms:
+            rows = np.full(size, order[row])
+            image[row] = _PairsCommute(table, rows, order, mode)
+            continue
+
+        # samplesPerPixel random positions in the row bin and in every column bin
+        rowPositions = starts[row] + (rng.random((size, samplesPerPixel)) * lengths[row]).astype(np.int64)
+        columnPositions = starts[:, None] + (rng.random((size, samplesPerPixel)) * lengths[:, None]).astype(np.int64)
+
+        image[row] = _PairsCommute(table, order[rowPositions], order[columnPositions], mode).mean(axis=1)
+
+    return image, boundaries
+
+
+def RenderAdjacency(pauliStrings, path: str, mode: str = 'GC', families: list = None, pixels: int = 512, samplesPerPixel: int = 16,
+                    title: str = None, seed = None):
+    '''
+    writes the (family sorted) adjacency density of the strings to path, e.g. 'graph_GC.png' or 'graph_GC.svg'.
+    Family boundaries are drawn if there are not too many of them
+    '''
+    image, boundaries = DensityImage(pauliStrings, mode, families, pixels, samplesPerPixel, seed)
+
+    figure = Figure(figsize=(8, 8))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+
+    # the axes are in strings, not pixels
+    nTerms = len(pauliStrings)
+    ax.imshow(image, cmap='Greys', vmin=0., vmax=1., interpolation='nearest', extent=(0, nTerms, nTerms, 0))
+
+    if 0 < len(boundaries) <= 200:
+        for boundary in boundaries:
+            ax.axhline(boundary, color='red', linewidth=0.3)
+            ax.axvline(boundary, color='red', linewidth=0.3)
+
+    ax.set_xlabel('strings (sorted by family), ' + str(nTerms) + ' in total')
+    ax.set_title(title if title is not None else mode + ' commutation')
+
+    figure.savefig(path, dpi=150, bbox_inches='tight')
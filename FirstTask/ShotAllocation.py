@@ -0,0 +1,104 @@
+import numpy as np
+from PauliTable import PauliTable, Popcount
+
+'''
+This file contains the distribution of measurement shots over the commuting families.
+
+Every family f is measured N_f times. If the strings in a family are measured independently, the variance of the energy estimate is
+
+                Var(E) = sum_f  sigma_f^2 / N_f,        sigma_f^2 = sum_{t in f}  w_t^2 Var(P_t)
+
+Minimizing the total number of shots for Var(E) = precision^2 gives N_f proportional to sigma_f:
+
+                N_f = sigma_f * (sum_g sigma_g) / precision^2,      N_total = (sum_f sigma_f)^2 / precision^2
+
+Without variance estimates, Var(P_t) = 1 - <P_t>^2 is bounded by 1 (and is 0 for the identity string).
+The sums are done with np.bincount over all terms of all families at once, so thousands of families cost nothing.
+'''
+
+
+def _FlatFamilies(families: list):
+    '''
+    all strings of all families in one list, and the family index of each of them
+    '''
+    labels = [pauliString for family in families for pauliString in family]
+    familyIndex = np.repeat(np.arange(len(families)), [len(family) for family in families])
+    return labels, familyIndex
+
+
+def _TermValues(labels: list, values, default = None):
+    if values is None:
+        return default
+    if isinstance(values, dict):
+        return np.array([values[label] for label in labels], dtype=np.float64)
+    return np.asarray(values, dtype=np.float64)
+
+
+def FamilyVariances(families: list, weights, variances = None):
+    '''
+    Accepts:
+        families:   list of families (lists of strings), e.g. from find_max_clique / ReturnChosenClique
+        weights:    dict {paulistring: weight} as for SummedWeight
+        variances:  dict {paulistring: Var(P)}, or None for the upper bound 1 (0 for the identity)
+
+    Returns:
+        array of sigma_f^2, one per family
+    '''
+    if len(families) == 0:
+        return np.zeros(0)
+
+    labels, familyIndex = _FlatFamilies(families)
+
+    termWeights = _TermValues(labels, weights)
+
+    table = PauliTable(labels)
+    isIdentity = Popcount(table.xBits | table.zBits).sum(axis=1) == 0
+    termVariances = _TermValues(labels, variances, default=np.where(isIdentity, 0., 1.))
+
+    return np.bincount(familyIndex, weights=termWeights**2 * termVariances, minlength=len(families))
+
+
+def AllocateShots(families: list, weights, precision: float, variances = None, familyVariances = None):
+    '''
+    Accepts:
+        families:           list of families (lists of strings)
+        weights:            dict {paulistring: weight}
+        precision:          target standard deviation of the energy estimate
+        variances:          optional dict {paulistring: Var(P)}
+        familyVariances:    optional sigma_f^2 per family, e.g. including covariances. Replaces weights / variances
+
+    Returns:
+        shots:              int array, number of shots per family (rounded up, so the precision is reached)
+        totalShots:         sum of the shots
+    '''
+    if familyVariances is None:
+        familyVariances = FamilyVariances(families, weights, variances)
+
+    standardDeviations = np.sqrt(np.maximum(np.asarray(familyVariances, dtype=np.float64), 0.))
+
+    shots = np.ceil(standardDeviations * standardDeviations.sum() / precision**2).astype(np.int64)
+
+    return shots, int(shots.sum())
+
+
+def ExpectedTotalShots(families: list, weights, precision: float, variances = None, familyVariances = None) -> float:
+    '''
+    (sum_f sigma_f)^2 / precision^2, the total without rounding
+    '''
+    if familyVariances is None:
+        familyVariances = FamilyVariances(families, weights, variances)
+
+    return float(np.sqrt(np.maximum(familyVariances, 0.)).sum()**2 / precision**2)
+
+
+def CompareGroupingShots(weights: dict, familiesQWC: list, familiesGC: list, precision: float, variances = None) -> dict:
+    '''
+    expected total number of shots for measuring every string on its own (naive), and for the QWC and GC families
+    '''
+    naiveFamilies = [[pauliString] for pauliString in weights]
+
+    return {
+        'naive': ExpectedTotalShots(naiveFamilies, weights, precision, variances),
+        'QWC': ExpectedTotalShots(familiesQWC, weights, precision, variances),
+        'GC': ExpectedTotalShots(familiesGC, weights, precision, variances),
+    }
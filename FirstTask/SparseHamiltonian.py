@@ -0,0 +1,147 @@
+import numpy as np
+import scipy.sparse as sparse
+import scipy.sparse.linalg as sparseLinalg
+from PauliTable import PauliTable, Popcount
+from PauliOperator import BasisMasks, WalshHadamardTransform
+
+'''
+This file contains the exact reference for the energy estimates: the weighted Pauli strings are assembled into one sparse Hamiltonian
+and its lowest eigenvalues are computed with a sparse Lanczos solver (scipy.sparse.linalg.eigsh).
+
+Assembly: every term with masks (x, z) has its nonzeros at (b ^ x, b) (see PauliOperator.py). So all terms with the same x share their
+sparsity pattern, and the values of such a group are
+
+                f(b) = sum_t  w_t i^popcount(x & z_t) (-1)^popcount(z_t & b)
+
+For a group with many terms this is a Walsh-Hadamard transform of the coefficients placed at the z_t (O(n 2^n)), for a group with few terms
+the sum is done directly. Zeros (e.g. from particle number conservation) are dropped before building the CSR matrix.
+'''
+
+# values below this are treated as zero when assembling
+ZERO_TOLERANCE = 1e-12
+
+
+def TermsAndCoefficients(pauliStrings, weights = None):
+    '''
+    accepts the weights dict {paulistring: weight} of the notebook, or strings (list / PauliTable) and a weights array / dict
+
+    Returns:
+        table:          PauliTable of the terms
+        coefficients:   array of the weights in the order of the table
+    '''
+    if isinstance(pauliStrings, dict):
+        weights = pauliStrings
+        pauliStrings = list(pauliStrings.keys())
+
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+
+    if weights is None:
+        raise ValueError('the weights of the Pauli strings are needed')
+
+    if isinstance(weights, dict):
+        coefficients = np.array([weights[pauliString] for pauliString in table])
+    else:
+        coefficients = np.asarray(weights)
+
+    if coefficients.shape != (len(table),):
+        raise ValueError('there have to be as many weights as Pauli strings')
+
+    return table, coefficients
+
+
+def AssembleHamiltonian(pauliStrings, weights = None, format: str = 'csr'):
+    '''
+    Accepts:
+        pauliStrings:   weights dict {paulistring: weight}, or a list of strings / PauliTable
+        weights:        weights in the order of the strings (array or dict), if pauliStrings is not a dict
+
+    Returns:
+        scipy.sparse matrix of sum_t w_t P_t, basis ordered as PauliStringToMatrix
+    '''
+    table, coefficients = TermsAndCoefficients(pauliStrings, weights)
+    nQ = table.nQ
+    dimension = 2**nQ
+
+    xMasks, zMasks = BasisMasks(table)
+
+    # the i^popcount(x & z) of the Y's goes into the coefficients
+    coefficients = coefficients * (1j)**(Popcount(xMasks & zMasks) % 4)
+
+    basisStates = np.arange(dimension, dtype=np.int64)
+
+    # 32 bit indices halve the memory of the assembly, up to 31 qubits
+    indexType = np.int32 if nQ < 31 else np.int64
+
+    order = np.argsort(xMasks, kind='stable')
+    uniqueX, groupStarts = np.unique(xMasks[order], return_index=True)
+    groupStops = np.append(groupStarts[1:], len(order))
+
+    rows, columns, values = [], [], []
+
+    for x, start, stop in zip(uniqueX, groupStarts, groupStops):
+        group = order[start:stop]
+
+        if len(group) > nQ:
+            placed = np.zeros(dimension, dtype=np.complex128)
+            np.add.at(placed, zMasks[group], coefficients[group])
+            groupValues = WalshHadamardTransform(placed)
+        else:
+            groupValues = np.zeros(dimension, dtype=np.complex128)
+            for term in group:
+                signs = 1 - 2*(Popcount(basisStates & zMasks[term]) & 1).astype(np.int8)
+                groupValues += coefficients[term]*signs
+
+        nonzero = np.nonzero(np.abs(groupValues) > ZERO_TOLERANCE)[0].astype(indexType)
+
+        rows.append(nonzero ^ indexType(x))
+        columns.append(nonzero)
+        values.append(groupValues[nonzero])
+
+    if len(values) == 0:
+        return sparse.csr_matrix((dimension, dimension), dtype=np.complex128).asformat(format)
+
+    values = np.concatenate(values)
+
+    # for real weights the imaginary parts cancel, a real matrix halves the memory of the solver
+    if np.all(np.abs(values.imag) <= ZERO_TOLERANCE):
+        values = values.real
+
+    hamiltonian = sparse.csr_matrix((values, (np.concatenate(rows), np.concatenate(columns))), shape=(dimension, dimension))
+
+    return hamiltonian.asformat(format)
+
+
+def LowestEigenvalues(hamiltonian, k: int = 1, returnStates: bool = False):
+    '''
+    Accepts:
+        hamiltonian:    hermitian sparse matrix (e.g. from AssembleHamiltonian)
+        k:              number of eigenvalues
+        returnStates:   if True, also return the eigenvectors (as columns)
+
+    Returns:
+        the k lowest eigenvalues in increasing order (and the eigenvectors)
+    '''
+    dimension = hamiltonian.shape[0]
+
+    # Lanczos needs k < dimension - 1, small matrices are just diagonalized
+    if dimension <= 64 or k >= dimension - 1:
+        energies, states = np.linalg.eigh(hamiltonian.toarray())
+        energies, states = energies[:k], states[:, :k]
+    else:
+        energies, states = sparseLinalg.eigsh(hamiltonian, k=k, which='SA')
+        order = np.argsort(energies)
+        energies, states = energies[order], states[:, order]
+
+    if returnStates:
+        return energies, states
+
+    return energies
+
+
+def ExactGroundEnergy(pauliStrings, weights = None, k: int = 1, returnStates: bool = False):
+    '''
+    reference ground state energy for comparing the Naive / QWC / GC estimates. Same input as AssembleHamiltonian
+    '''
+    hamiltonian = AssembleHamiltonian(pauliStrings, weights)
+
+    return LowestEigenvalues(hamiltonian, k=k, returnStates=returnStates)
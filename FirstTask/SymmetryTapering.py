@@ -0,0 +1,279 @@
+import numpy as np
+from PauliTable import PauliTable, Popcount, PackBits, UnpackBits
+from PauliOperator import PauliOperator, MultiplyPaulis
+from SparseHamiltonian import TermsAndCoefficients
+from HamiltonianLoader import TermAccumulator, CHUNK_SIZE
+
+'''
+This file contains Z2 symmetry tapering (Bravyi et al. 2017): qubits are removed from the Hamiltonian before it is grouped.
+
+1.  A Pauli string tau = X^a Z^b commutes with a term (x | z) iff  z.a + x.b = 0 (mod 2). So the symmetries of the Hamiltonian are the
+    kernel of the binary matrix with one row (z | x) per term. Only a basis of the row space is needed for this; it is found by
+    Gaussian elimination on the packed rows, and rows that become zero are dropped right away, so 10^5 terms are reduced to at most 2 nQ.
+
+2.  Symmetries that anticommute with each other can not be fixed at the same time. A maximal commuting subset is chosen by symplectic
+    Gram-Schmidt (one symmetry of every anticommuting pair is kept).
+
+3.  For every generator tau_i, a single qubit Pauli sigma_i on its own qubit q_i is chosen, that anticommutes with tau_i and commutes with all
+    other generators (the other generators are multiplied by tau_i where needed). The Clifford U_i = (sigma_i + tau_i) / sqrt(2) maps tau_i
+    to sigma_i, and a term P to P if it commutes with sigma_i, otherwise to -P sigma_i tau_i.
+
+4.  After all U_i, every term has I or sigma_i on q_i. sigma_i is replaced by its eigenvalue (the sector, +1 or -1) and q_i is removed.
+
+The vectors of the small sets (kernel, generators) are python ints as in GF2Algebra.py: x in the lower nQ bits, z in the upper nQ bits.
+'''
+
+
+def _Bit(rows, column: int, nQ: int, nWords: int):
+    '''
+    bit of column (0 ... 2 nQ - 1) of the packed (z | x) rows
+    '''
+    word = (column // nQ)*nWords + (column % nQ)//64
+    return ((rows[..., word] >> np.uint64((column % nQ) % 64)) & np.uint64(1)).astype(bool)
+
+
+def _RowSpaceBasis(table: PauliTable):
+    '''
+    reduced row echelon basis of the rows (z | x) of all terms
+
+    Returns:
+        basis:          list of packed rows
+        pivotColumns:   pivot column of every basis row
+    '''
+    nQ, nWords = table.nQ, table.xBits.shape[1]
+    rows = np.unique(np.concatenate((table.zBits, table.xBits), axis=1), axis=0)
+    rows = rows[rows.any(axis=1)]
+
+    basis, pivotColumns = [], []
+
+    for column in range(2*nQ):
+        if len(rows) == 0:
+            break
+
+        hasBit = _Bit(rows, column, nQ, nWords)
+        if not hasBit.any():
+            continue
+
+        pivotRow = rows[int(np.argmax(hasBit))].copy()
+        rows[hasBit] ^= pivotRow
+        rows = rows[rows.any(axis=1)]
+
+        # fully reduced: the pivot column is also removed from the earlier basis rows
+        for position in range(len(basis)):
+            if _Bit(basis[position], column, nQ, nWords):
+                basis[position] = basis[position] ^ pivotRow
+
+        basis.append(pivotRow)
+        pivotColumns.append(column)
+
+    return basis, pivotColumns
+
+
+def _SymplecticProduct(u: int, v: int, nQ: int) -> int:
+    low = (1 << nQ) - 1
+    return bin(((u & low) & (v >> nQ)) ^ ((u >> nQ) & (v & low))).count('1') & 1
+
+
+def FindSymmetries(pauliStrings) -> list:
+    '''
+    basis of all Pauli strings (as (x | z) ints, see above) that commute with every term, the kernel of the (z | x) matrix
+    '''
+    table = pauliStrings if isinstance(pauliStrings, PauliTable) else PauliTable(pauliStrings)
+    nQ, nWords = table.nQ, table.xBits.shape[1]
+
+    basis, pivotColumns = _RowSpaceBasis(table)
+
+    kernel = []
+    for free in sorted(set(range(2*nQ)) - set(pivotColumns)):
+        # column c of the (z | x) rows pairs with bit c of the symmetry, so the kernel vectors are (x | z) ints directly
+        vector = 1 << free
+        for row, pivot in zip(basis, pivotColumns):
+            if _Bit(row, free, nQ, nWords):
+                vector |= 1 << pivot
+        kernel.append(vector)
+
+    return kernel
+
+
+def _CommutingGenerators(symmetries: list, nQ: int) -> list:
+    '''
+    maximal commuting subset of the span of the symmetries, by symplectic Gram-Schmidt
+    '''
+    remaining, generators = list(symmetries), []
+
+    while remaining:
+        vector = remaining.pop(0)
+        partner = next((other for other in remaining if _SymplecticProduct(vector, other, nQ)), None)
+
+        if partner is not None:
+            remaining.remove(partner)
+            remaining = [other ^ (vector if _SymplecticProduct(other, partner, nQ) else 0) ^ (partner if _SymplecticProduct(other, vector, nQ) else 0)
+                         for other in remaining]
+
+        generators.append(vector)
+
+    return generators
+
+
+def _TaperingQubits(generators: list, nQ: int):
+    '''
+    one qubit and single qubit Pauli sigma_i per generator, sigma_i anticommutes only with generator i
+
+    Returns:
+        generators (multiplied with each other where needed), qubits, sigmas as (x | z) ints
+    '''
+    generators = list(generators)
+    qubits, sigmas = [], []
+
+    for i in range(len(generators)):
+        qubit = next(q for q in range(nQ) if q not in qubits and (generators[i] >> q | generators[i] >> (nQ + q)) & 1)
+
+        # X anticommutes with Z and Y, Z with X
+        sigma = 1 << qubit if (generators[i] >> (nQ + qubit)) & 1 else 1 << (nQ + qubit)
+
+        for j in range(len(generators)):
+            if j != i and _SymplecticProduct(generators[j], sigma, nQ):
+                generators[j] ^= generators[i]
+
+        qubits.append(qubit)
+        sigmas.append(sigma)
+
+    return generators, qubits, sigmas
+
+
+def _VectorMasks(vectors: list, nQ: int):
+    bits = np.array([[(vector >> q) & 1 for q in range(2*nQ)] for vector in vectors], dtype=bool).reshape(len(vectors), 2*nQ)
+    return PackBits(bits[:, :nQ]), PackBits(bits[:, nQ:])
+
+
+class Tapering:
+    '''
+    Mapping between the full and the tapered qubits.
+
+    Attributes:
+        nQ:             number of qubits before tapering
+        generators:     PauliTable of the symmetries tau_i that were fixed
+        qubits:         removed qubit q_i of every generator
+        sigmas:         PauliTable of the single qubit Paulis sigma_i
+        sector:         eigenvalue (+1 or -1) of every generator
+        keptQubits:     qubits of the tapered Hamiltonian, in order
+    '''
+
+    def __init__(self, nQ: int, generators: list, qubits: list, sigmas: list, sector):
+        self.nQ = nQ
+        self.generators = PauliTable.FromMasks(*_VectorMasks(generators, nQ), nQ)
+        self.qubits = list(qubits)
+        self.sigmas = PauliTable.FromMasks(*_VectorMasks(sigmas, nQ), nQ)
+        self.sector = np.asarray(sector, dtype=np.int64)
+        self.keptQubits = [q for q in range(nQ) if q not in set(qubits)]
+
+
+    def Taper(self, pauliStrings, weights = None, tolerance: float = 1e-12):
+        '''
+        tapers any operator that commutes with the generators (the Hamiltonian, but also e.g. the number operator)
+
+        Returns:
+            table, coefficients of the operator on the kept qubits, identical strings merged
+        '''
+        table, coefficients = TermsAndCoefficients(pauliStrings, weights)
+        x, z = table.xBits.copy(), table.zBits.copy()
+        coefficients = np.asarray(coefficients, dtype=np.complex128).copy()
+
+        for i in range(len(self.qubits)):
+            sigmaX, sigmaZ = self.sigmas.xBits[i], self.sigmas.zBits[i]
+            tauX, tauZ = self.generators.xBits[i], self.generators.zBits[i]
+
+            # U_i P U_i = -P sigma_i tau_i for the terms that anticommute with sigma_i
+            flip = (Popcount((x & sigmaZ) ^ (z & sigmaX)).sum(axis=1) & 1).astype(bool)
+            power1, x1, z1 = MultiplyPaulis(x[flip], z[flip], sigmaX, sigmaZ)
+            power2, x2, z2 = MultiplyPaulis(x1, z1, tauX, tauZ)
+
+            coefficients[flip] *= -(1j)**((power1.sum(axis=1) + power2.sum(axis=1)) % 4)
+            x[flip], z[flip] = x2, z2
+
+        xBits, zBits = UnpackBits(x, self.nQ), UnpackBits(z, self.nQ)
+
+        # every term has I or sigma_i on q_i, sigma_i is replaced by its eigenvalue
+        for qubit, eigenvalue in zip(self.qubits, self.sector):
+            coefficients[xBits[:, qubit] | zBits[:, qubit]] *= eigenvalue
+
+        xBits, zBits = PackBits(xBits[:, self.keptQubits]), PackBits(zBits[:, self.keptQubits])
+
+        accumulator = TermAccumulator(xBits.shape[1], dtype=np.complex128)
+        for start in range(0, len(coefficients), CHUNK_SIZE):
+            accumulator.AddChunk(xBits[start:start + CHUNK_SIZE], zBits[start:start + CHUNK_SIZE], coefficients[start:start + CHUNK_SIZE])
+        taperedTable, taperedCoefficients = accumulator.Result(len(self.keptQubits), True, tolerance)
+
+        if np.all(np.abs(taperedCoefficients.imag) <= tolerance):
+            taperedCoefficients = taperedCoefficients.real.copy()
+
+        return taperedTable, taperedCoefficients
+
+
+    def ExpandState(self, state):
+        '''
+        maps a statevector of the tapered qubits back to the full qubits: the removed qubits are put into the eigenstates of sigma_i,
+        then U_k ... U_1 is undone. Basis order as PauliStringToMatrix
+        '''
+        state = np.asarray(state, dtype=np.complex128).reshape((2,)*len(self.keptQubits))
+
+        for qubit, sigma, eigenvalue in sorted(zip(self.qubits, self.sigmas, self.sector)):
+            pauli = sigma[qubit]
+            if pauli == 'Z':
+                vector = np.array([1., 0.]) if eigenvalue == 1 else np.array([0., 1.])
+            else:
+                vector = np.array([1., eigenvalue*(1j if pauli == 'Y' else 1.)]) / np.sqrt(2)
+            state = np.moveaxis(np.tensordot(state, vector, axes=0), -1, qubit)
+
+        state = state.reshape(-1)
+
+        for sigma, tau in zip(reversed(list(self.sigmas)), reversed(list(self.generators))):
+            state = (PauliOperator(sigma).Apply(state) + PauliOperator(tau).Apply(state)) / np.sqrt(2)
+
+        return state
+
+
+def SectorOfReference(generators: PauliTable, reference: str):
+    '''
+    eigenvalues of diagonal (Z type) generators in a computational basis state, e.g. Hartree-Fock '1100' (first qubit first)
+    '''
+    if generators.xBits.any():
+        raise ValueError('the sector of a reference state is only defined for Z type symmetries, pass the sector explicitly')
+
+    referenceBits = PackBits(np.array([[character == '1' for character in reference]], dtype=bool))
+
+    return 1 - 2*(Popcount(generators.zBits & referenceBits).sum(axis=1) & 1).astype(np.int64)
+
+
+def TaperHamiltonian(pauliStrings, weights = None, sector = None, reference: str = None, tolerance: float = 1e-12):
+    '''
+    Accepts:
+        pauliStrings:   weights dict {paulistring: weight}, or strings (list / PauliTable) and weights
+        weights:        weights if pauliStrings is not a dict
+        sector:         eigenvalue (+1 / -1) of every generator. Default: from the reference state, or all +1
+        reference:      computational basis state (e.g. Hartree-Fock '1100') that fixes the sector
+        tolerance:      merged terms with |coefficient| <= tolerance are dropped
+
+    Returns:
+        table, coefficients:    tapered Hamiltonian, can go into create_Graph_GC / BuildAdjacency as every other PauliTable
+        tapering:               Tapering, the mapping back (generators, removed qubits, sector, ExpandState)
+    '''
+    table, coefficients = TermsAndCoefficients(pauliStrings, weights)
+    nQ = table.nQ
+
+    generators = _CommutingGenerators(FindSymmetries(table), nQ)
+    generators, qubits, sigmas = _TaperingQubits(generators, nQ)
+
+    if sector is None:
+        if reference is not None:
+            sector = SectorOfReference(PauliTable.FromMasks(*_VectorMasks(generators, nQ), nQ), reference)
+        else:
+            sector = np.ones(len(generators), dtype=np.int64)
+
+    if len(sector) != len(generators):
+        raise ValueError('the sector needs one eigenvalue for each of the ' + str(len(generators)) + ' symmetries')
+
+    tapering = Tapering(nQ, generators, qubits, sigmas, sector)
+    taperedTable, taperedCoefficients = tapering.Taper(table, coefficients, tolerance)
+
+    return taperedTable, taperedCoefficients, tapering
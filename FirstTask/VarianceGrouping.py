@@ -0,0 +1,157 @@
+import numpy as np
+from PauliTable import Popcount
+from PauliOperator import BasisMasks, MultiplyPaulis, PauliExpectations
+from SparseHamiltonian import TermsAndCoefficients
+from CommutationMatrix import BuildAdjacency
+from FamilyPartition import PartitionFamilies
+from ShotAllocation import ExpectedTotalShots
+
+'''
+This file contains a grouping that minimizes the number of shots instead of the number of families.
+
+The shots needed for a precision eps are (sum_f sigma_f)^2 / eps^2 (see ShotAllocation.py), where for commuting strings measured together
+
+                sigma_f^2 = sum_{i, j in f}  w_i w_j Cov(P_i, P_j),       Cov(P_i, P_j) = <P_i P_j> - <P_i><P_j>
+
+The expectation values are taken in a reference state (a computational basis state such as Hartree-Fock, or a statevector).
+P_i P_j is again a Pauli string (times a phase), so all covariances are expectation values of Pauli strings and are evaluated in batch
+with PauliExpectations.
+
+The strings are inserted greedily, largest |w| sigma first. A string joins the compatible family whose sigma_f grows the least,
+or starts a new family if that is cheaper.
+'''
+
+
+def _Compatible(mode: str, x, z, otherX, otherZ):
+    nonCommutingCounts = Popcount((x & otherZ) ^ (z & otherX))
+    if mode == 'QWC':
+        return nonCommutingCounts == 0
+    return nonCommutingCounts % 2 == 0
+
+
+def _ReferenceData(pauliStrings, weights, reference):
+    table, coefficients = TermsAndCoefficients(pauliStrings, weights)
+    xMasks, zMasks = BasisMasks(table)
+    expectations = PauliExpectations(reference)
+    means = expectations(xMasks, zMasks)
+
+    return table, np.real(coefficients).astype(np.float64), xMasks, zMasks, expectations, means
+
+
+def _Covariances(expectations, means, xMasks, zMasks, index: int, others):
+    '''
+    Cov(P_index, P_other) for all others, the strings have to commute
+    '''
+    power, x, z = MultiplyPaulis(xMasks[index], zMasks[index], xMasks[others], zMasks[others])
+
+    # for commuting strings the product is hermitian, so the phase is +1 or -1
+    productMeans = (1 - (power == 2)*2) * expectations(x, z)
+
+    return productMeans - means[index]*means[others]
+
+
+def CovarianceFamilyVariances(families: list, pauliStrings, weights, reference):
+    '''
+    sigma_f^2 of every family, including the covariances in the reference state. Can be passed to AllocateShots as familyVariances
+    '''
+    table, coefficients, xMasks, zMasks, expectations, means = _ReferenceData(pauliStrings, weights, reference)
+    indexOf = {label: index for index, label in enumerate(table)}
+
+    familyVariances = np.zeros(len(families))
+
+    for f, family in enumerate(families):
+        members = np.array([indexOf[label] for label in family], dtype=np.int64)
+        for position, index in enumerate(members):
+            covariances = _Covariances(expectations, means, xMasks, zMasks, index, members[position:])
+            # the off diagonal pairs appear twice in the double sum
+            factors = np.where(np.arange(len(covariances)) == 0, 1., 2.)
+            familyVariances[f] += coefficients[index] * np.sum(factors * coefficients[members[position:]] * covariances)
+
+    return familyVariances
+
+
+def VarianceAwareFamilies(pauliStrings, weights = None, reference = 0, mode: str = 'GC'):
+    '''
+    Accepts:
+        pauliStrings:   weights dict {paulistring: weight}, or strings (list / PauliTable) and weights
+        weights:        weights if pauliStrings is not a dict
+        reference:      reference state: statevector, basis state index, or bitstring with the first qubit first (e.g. '1100')
+        mode:           'QWC' or 'GC'
+
+    Returns:
+        families:           list of families (lists of strings), format of find_max_clique
+        familyVariances:    sigma_f^2 of every family in the reference state
+    '''
+    if mode not in ('QWC', 'GC'):
+        raise ValueError('mode has to be QWC or GC, not ' + str(mode))
+
+    table, coefficients, xMasks, zMasks, expectations, means = _ReferenceData(pauliStrings, weights, reference)
+    nTerms = len(table)
+
+    variances = np.maximum(1 - means**2, 0.)
+    order = np.argsort(-np.abs(coefficients)*np.sqrt(variances), kind='stable')
+
+    # already placed strings and their families, in the order they were placed
+    placed = np.zeros(nTerms, dtype=np.int64)
+    familyOfPlaced = np.zeros(nTerms, dtype=np.int64)
+    familyVariances = []
+
+    for nPlaced, index in enumerate(order):
+        ownVariance = coefficients[index]**2 * variances[index]
+        bestFamily, bestIncrease = -1, np.sqrt(ownVariance)
+
+        if nPlaced > 0:
+            others = placed[:nPlaced]
+            otherFamilies = familyOfPlaced[:nPlaced]
+            nFamilies = len(familyVariances)
+
+            # a family is compatible if none of its members is incompatible
+            incompatible = ~_Compatible(mode, xMasks[index], zMasks[index], xMasks[others], zMasks[others])
+            compatibleFamilies = np.bincount(otherFamilies, weights=incompatible, minlength=nFamilies) == 0
+
+            candidates = compatibleFamilies[otherFamilies]
+            if np.any(candidates):
+                covariances = _Covariances(expectations, means, xMasks, zMasks, index, others[candidates])
+                crossTerms = np.bincount(otherFamilies[candidates], weights=coefficients[others[candidates]]*covariances, minlength=nFamilies)
+
+                currentVariances = np.array(familyVariances)
+                newVariances = np.maximum(currentVariances + ownVariance + 2*coefficients[index]*crossTerms, 0.)
+                increases = np.where(compatibleFamilies, np.sqrt(newVariances) - np.sqrt(currentVariances), np.inf)
+
+                family = int(np.argmin(increases))
+                if increases[family] <= bestIncrease:
+                    bestFamily, bestIncrease = family, increases[family]
+                    familyVariances[family] = newVariances[family]
+
+        if bestFamily == -1:
+            bestFamily = len(familyVariances)
+            familyVariances.append(ownVariance)
+
+        placed[nPlaced] = index
+        familyOfPlaced[nPlaced] = bestFamily
+
+    families = [[] for _ in familyVariances]
+    for index, family in zip(placed, familyOfPlaced):
+        families[family].append(table[index])
+
+    return families, np.array(familyVariances)
+
+
+def CompareWithCountMinimizing(pauliStrings, weights = None, reference = 0, mode: str = 'GC', precision: float = 1.) -> dict:
+    '''
+    estimated total shots (for the given precision) of the variance aware grouping and of the family count minimizing grouping
+    (DSATUR coloring, PartitionFamilies), both evaluated with the covariances in the reference state
+    '''
+    table, coefficients = TermsAndCoefficients(pauliStrings, weights)
+
+    varianceFamilies, varianceFamilyVariances = VarianceAwareFamilies(table, coefficients, reference, mode)
+
+    countFamilies = PartitionFamilies(BuildAdjacency(table, mode), 'dsatur', labels=list(table))
+    countFamilyVariances = CovarianceFamilyVariances(countFamilies, table, coefficients, reference)
+
+    return {
+        'varianceAwareShots': ExpectedTotalShots(varianceFamilies, None, precision, familyVariances=varianceFamilyVariances),
+        'varianceAwareFamilies': len(varianceFamilies),
+        'countMinimizingShots': ExpectedTotalShots(countFamilies, None, precision, familyVariances=countFamilyVariances),
+        'countMinimizingFamilies': len(countFamilies),
+    }